@@ -1,3 +1,11 @@
 from django.contrib import admin
+from .models import AuthToken
 
-# Register your models here.
+
+@admin.register(AuthToken)
+class AuthTokenAdmin(admin.ModelAdmin):
+    list_display = ('user', 'created', 'expires_at', 'revoked')
+    list_filter = ('revoked',)
+    list_select_related = ('user',)
+    search_fields = ('user__username',)
+    readonly_fields = ('user', 'key_hash', 'created', 'expires_at')
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from .models import AuthToken, hash_token
+
+TOKEN_CACHE_SIZE = getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 1024)
+TOKEN_CACHE_TTL = getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 60)
+
+
+class TokenCache:
+    """Small in-process LRU of token hash -> (token, user).
+
+    Entries are rechecked against the database after TOKEN_CACHE_TTL
+    seconds, which bounds how long a token revoked in another process
+    keeps working here.
+    """
+
+    def __init__(self, size=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key_hash):
+        with self._lock:
+            entry = self._entries.get(key_hash)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key_hash]
+                return None
+            self._entries.move_to_end(key_hash)
+            return entry[1]
+
+    def set(self, key_hash, token):
+        with self._lock:
+            self._entries[key_hash] = (time.monotonic() + self.ttl, token)
+            self._entries.move_to_end(key_hash)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key_hash):
+        with self._lock:
+            self._entries.pop(key_hash, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+class ExpiringTokenAuthentication(BaseAuthentication):
+    """`Authorization: Token <key>` with hashed, expiring and revocable keys.
+
+    A lookup is a SHA-256 of the key plus a cache hit, instead of the
+    PBKDF2 password check BasicAuthentication runs on every request.
+    """
+    keyword = 'Token'
+
+    def authenticate(self, request):
+        key_hash = self.get_key_hash(request)
+        if key_hash is None:
+            return None
+        token = token_cache.get(key_hash)
+        if token is None:
+            token = AuthToken.objects.select_related('user').filter(key_hash=key_hash, revoked=False).first()
+            if token is not None:
+                # Only filled on a miss, so a cached token is rechecked every TOKEN_CACHE_TTL
+                token_cache.set(key_hash, token)
+        return self.check_token(key_hash, token)
+
+    async def aauthenticate(self, request):
+        """Async variant of `authenticate` for the async views."""
+        key_hash = self.get_key_hash(request)
+        if key_hash is None:
+            return None
+        token = token_cache.get(key_hash)
+        if token is None:
+            token = await AuthToken.objects.select_related('user').filter(key_hash=key_hash, revoked=False).afirst()
+            if token is not None:
+                # Only filled on a miss, so a cached token is rechecked every TOKEN_CACHE_TTL
+                token_cache.set(key_hash, token)
+        return self.check_token(key_hash, token)
+
+    def get_key_hash(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        return hash_token(key)
+
+    def check_token(self, key_hash, token):
+        if token is None:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        if token.is_expired:
+            token_cache.discard(key_hash)
+            raise exceptions.AuthenticationFailed('Token has expired.')
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        return token.user, token
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+def revoke_token(token):
+    """Revoke a token and drop it from this process's cache."""
+    AuthToken.objects.filter(pk=token.pk).update(revoked=True)
+    token_cache.discard(token.key_hash)
@@ -1,3 +1,40 @@
+import hashlib
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+AUTH_TOKEN_TTL = getattr(settings, 'AUTH_TOKEN_TTL', timedelta(days=7))
+
+
+def hash_token(key):
+    """Tokens are stored as SHA-256 digests; the raw key is only shown once."""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class AuthToken(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='auth_tokens')
+    key_hash = models.CharField(max_length=64, unique=True)
+    created = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    revoked = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"Token of {self.user} (expires {self.expires_at:%Y-%m-%d %H:%M})"
+
+    @classmethod
+    def issue(cls, user, ttl=None):
+        """Create a token for the user and return (token, raw_key)."""
+        key = secrets.token_urlsafe(32)
+        token = cls.objects.create(
+            user=user,
+            key_hash=hash_token(key),
+            expires_at=timezone.now() + (ttl or AUTH_TOKEN_TTL),
+        )
+        return token, key
 
-# Create your models here.
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
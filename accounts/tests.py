@@ -1,3 +1,68 @@
+from datetime import timedelta
+from unittest import mock
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import CustomUser
+from .authentication import TOKEN_CACHE_TTL, token_cache
+from .models import AuthToken
+
+
+class TokenAuthenticationTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = CustomUser.objects.create_user('alice', 'alice@example.com', 'secret-pass')
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post('/accounts/login/', {'username': 'alice', 'password': 'secret-pass'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.client.logout()  # Only the token authenticates from here on
+        return response.data['token']
+
+    def get_wallets(self, key):
+        return self.client.get('/api/wallets/', HTTP_AUTHORIZATION=f'Token {key}')
+
+    def test_token_authenticates(self):
+        key = self.login()
+        self.assertEqual(self.get_wallets(key).status_code, 200)
+        self.assertEqual(self.get_wallets('not-a-token').status_code, 401)
+
+    def test_expired_token_is_rejected(self):
+        key = self.login()
+        AuthToken.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        response = self.get_wallets(key)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data['detail'], 'Token has expired.')
+
+    def test_logout_revokes_token(self):
+        key = self.login()
+        response = self.client.post('/accounts/logout/', HTTP_AUTHORIZATION=f'Token {key}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(AuthToken.objects.get().revoked)
+        self.assertEqual(self.get_wallets(key).status_code, 401)
+
+    def test_revocation_elsewhere_applies_after_cache_ttl_despite_steady_use(self):
+        key = self.login()
+        now = [1000.0]
+        with mock.patch('accounts.authentication.time.monotonic', side_effect=lambda: now[0]):
+            self.assertEqual(self.get_wallets(key).status_code, 200)
+            # Revoked by another process: this process's cache is not told
+            AuthToken.objects.update(revoked=True)
+            now[0] += TOKEN_CACHE_TTL / 2
+            self.assertEqual(self.get_wallets(key).status_code, 200)
+            now[0] += TOKEN_CACHE_TTL / 2 + 1
+            self.assertEqual(self.get_wallets(key).status_code, 401)
 
-# Create your tests here.
+    def test_deactivated_user_is_rejected_after_cache_ttl(self):
+        key = self.login()
+        now = [1000.0]
+        with mock.patch('accounts.authentication.time.monotonic', side_effect=lambda: now[0]):
+            self.assertEqual(self.get_wallets(key).status_code, 200)
+            CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+            now[0] += TOKEN_CACHE_TTL / 2
+            self.get_wallets(key)
+            now[0] += TOKEN_CACHE_TTL / 2 + 1
+            self.assertEqual(self.get_wallets(key).status_code, 401)
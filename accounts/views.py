@@ -4,6 +4,8 @@ from rest_framework import status
 from django.contrib.auth import login, logout
 from api.serialaizer import RegisterSerializer, LoginSerializer
 from rest_framework.permissions import AllowAny
+from .authentication import revoke_token
+from .models import AuthToken
 
 
 class RegisterView(APIView):
@@ -25,16 +27,24 @@ class LoginView(APIView):
         if serializer.is_valid():
             user = serializer.validated_data
             login(request, user)  # Start a session for the user
+            token, key = AuthToken.issue(user)  # Token for scripted clients
             user_data = {
                 "username": user.username,
                 "email": user.email,
                 "id": user.id
             }  # You can include more user fields if needed
-            return Response({"message": "Login successful", "user": user_data}, status=status.HTTP_200_OK)
+            return Response({
+                "message": "Login successful",
+                "user": user_data,
+                "token": key,
+                "token_expires": token.expires_at,
+            }, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_401_UNAUTHORIZED)
 
 
 class LogoutView(APIView):
     def post(self, request):
+        if isinstance(request.auth, AuthToken):
+            revoke_token(request.auth)  # Logging out with a token revokes it
         logout(request)
         return Response({"message": "Logged out successfully"}, status=status.HTTP_200_OK)
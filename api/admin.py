@@ -1,5 +1,49 @@
 from django.contrib import admin
-from .models import CustomUser, UserProfile, Wallet, Transaction
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import F, Max, Min
+from django.utils.functional import cached_property
+from .dates import get_datetime_range
+from .models import CustomUser, UserProfile, Wallet, Transaction, TransactionArchive, TransactionRollup
+from .users import provision_accounts
+
+
+# Paginator that avoids COUNT(*) over very large unfiltered tables
+class EstimatedCountPaginator(Paginator):
+    estimate_threshold = 100000  # Only trust the estimate above this many rows
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if connection.vendor == 'postgresql' and query is not None and not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                    [self.object_list.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= self.estimate_threshold:
+                return row[0]
+        return super().count
+
+
+# Year drill-down read from the rollups instead of DISTINCT dates on the whole table
+class TransactionYearFilter(admin.SimpleListFilter):
+    title = 'year'
+    parameter_name = 'year'
+
+    def lookups(self, request, model_admin):
+        bounds = TransactionRollup.objects.aggregate(first=Min('day'), last=Max('day'))
+        if not bounds['first']:
+            return []
+        years = range(bounds['last'].year, bounds['first'].year - 1, -1)
+        return [(str(year), str(year)) for year in years]
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        start, end = get_datetime_range(self.value())
+        return queryset.filter(date__gte=start, date__lt=end)
 
 
 # Inline for UserProfile
@@ -26,44 +70,79 @@ class CustomUserAdmin(admin.ModelAdmin):
     ordering = ('date_joined',)
     inlines = [UserProfileInline, WalletInline]
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            provision_accounts([obj])
+
 
 # UserProfile Admin
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'get_email', 'salary')
+    list_select_related = ('user',)
     search_fields = ('user__username', 'user__email')
     list_filter = ('user__is_staff',)
     ordering = ('user',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
 
     def get_email(self, obj):
         return obj.user.email
     get_email.short_description = 'User Email'
+    get_email.admin_order_field = 'user__email'
 
 
 # Wallet Admin
 class WalletAdmin(admin.ModelAdmin):
     list_display = ('user', 'balance', 'get_email')
     search_fields = ('user__username', 'user__email')
+    list_select_related = ('user',)
     list_filter = ('user__is_active',)
     ordering = ('user',)
-    readonly_fields = ('balance',)
+    readonly_fields = ('balance', 'version')
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
 
     def get_email(self, obj):
         return obj.user.email
     get_email.short_description = 'User Email'
+    get_email.admin_order_field = 'user__email'
 
 
 # Transaction Admin
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ('wallet', 'get_user', 'amount', 'transaction_type', 'category', 'date')
-    list_filter = ('transaction_type', 'category', 'date')
+    list_select_related = ('wallet__user',)
+    list_filter = ('transaction_type', 'category', TransactionYearFilter, 'date')  # Филтр барои сана
     search_fields = ('wallet__user__username', 'wallet__user__email')
-    date_hierarchy = 'date'  # Филтр барои сана
     ordering = ('-date',)
     readonly_fields = ('wallet', 'amount', 'transaction_type', 'category', 'date', 'description')
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(username=F('wallet__user__username'))
 
     def get_user(self, obj):
-        return obj.wallet.user.username
+        return obj.username
     get_user.short_description = 'User'
+    get_user.admin_order_field = 'username'
+
+
+# Archived transactions are read-only; they only move back through the database
+class TransactionArchiveAdmin(admin.ModelAdmin):
+    list_display = ('id', 'wallet', 'amount', 'transaction_type', 'category', 'date')
+    list_select_related = ('wallet__user',)
+    list_filter = ('transaction_type', 'category')
+    ordering = ('-date',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 # Сабти моделҳо дар admin
@@ -71,3 +150,4 @@ admin.site.register(CustomUser, CustomUserAdmin)
 admin.site.register(UserProfile, UserProfileAdmin)
 admin.site.register(Wallet, WalletAdmin)
 admin.site.register(Transaction, TransactionAdmin)
+admin.site.register(TransactionArchive, TransactionArchiveAdmin)
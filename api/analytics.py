@@ -0,0 +1,138 @@
+"""Monthly spending trends computed from a wallet's rollups.
+
+The wallet's TransactionRollup rows are read in one query as columns
+(month index, type, category code, amount in cents), and the series are
+computed from them with vectorized NumPy operations.
+"""
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from .conditional import make_etag
+from .models import Transaction, TransactionRollup
+
+ANALYTICS_CACHE_ALIAS = getattr(settings, 'ANALYTICS_CACHE_ALIAS', 'default')
+ANALYTICS_CACHE_TIMEOUT = getattr(settings, 'ANALYTICS_CACHE_TIMEOUT', 60 * 60)
+FORECAST_HISTORY = 6  # Months the forecast line is fitted to
+
+CATEGORIES = [choice for choice, _ in Transaction.CATEGORY_CHOICES]
+CATEGORY_CODES = {category: code for code, category in enumerate(CATEGORIES)}
+
+
+def load_columns(wallet):
+    """Return (month index, is expense, category code, cents) columns of the wallet's rollups."""
+    rows = TransactionRollup.objects.filter(wallet=wallet).values_list('day', 'transaction_type', 'category', 'total')
+    months, expense, codes, cents = [], [], [], []
+    for day, transaction_type, category, total in rows:
+        months.append(day.year * 12 + day.month - 1)
+        expense.append(transaction_type == 'expense')
+        codes.append(CATEGORY_CODES.get(category, CATEGORY_CODES['other']))
+        cents.append(int(total * 100))
+    return months, expense, codes, cents
+
+
+def month_label(index):
+    return f'{index // 12:04d}-{index % 12 + 1:02d}'
+
+
+def _to_money(values):
+    return [round(value / 100, 2) for value in values]
+
+
+def _series(months, expense, codes, cents, window):
+    month = np.asarray(months, dtype=np.int64)
+    is_expense = np.asarray(expense, dtype=bool)
+    code = np.asarray(codes, dtype=np.int64)
+    amount = np.asarray(cents, dtype=np.int64)
+
+    first = month.min()
+    n_months = int(month.max() - first + 1)
+    offset = month - first
+    income = np.bincount(offset[~is_expense], weights=amount[~is_expense], minlength=n_months)
+    spent = np.bincount(offset[is_expense], weights=amount[is_expense], minlength=n_months)
+
+    by_category = np.zeros((len(CATEGORIES), n_months))
+    np.add.at(by_category, (code[is_expense], offset[is_expense]), amount[is_expense])
+    running = np.cumsum(by_category, axis=1)
+    moving = np.full_like(by_category, np.nan)
+    if n_months >= window:
+        totals = running[:, window - 1:].copy()
+        totals[:, 1:] -= running[:, :-window]
+        moving[:, window - 1:] = totals / window
+
+    change = np.full(n_months, np.nan)
+    change[1:] = np.diff(spent)
+    previous = spent[:-1]
+    change_pct = np.full(n_months, np.nan)
+    np.divide(change[1:] * 100, previous, out=change_pct[1:], where=previous != 0)
+
+    history = np.arange(max(0, n_months - FORECAST_HISTORY), n_months)
+    forecast = {}
+    for name, series in (('income', income), ('expense', spent)):
+        if len(history) >= 2:
+            slope, intercept = np.polyfit(history, series[history], 1)
+            forecast[name] = max(0.0, float(slope * n_months + intercept))
+        else:
+            forecast[name] = float(series[-1])
+
+    def listed(values):
+        return [None if np.isnan(value) else float(value) for value in values]
+
+    return {
+        'first_month': int(first),
+        'income': income.tolist(),
+        'expense': spent.tolist(),
+        'category_expense': by_category.tolist(),
+        'moving_average': [listed(row) for row in moving],
+        'expense_change': listed(change),
+        'expense_change_pct': listed(change_pct),
+        'forecast': forecast,
+    }
+
+
+def compute_trends(columns, window=3):
+    """Monthly income/expense, per-category moving averages, month-over-month
+    expense changes and a linear forecast of next month."""
+    months, expense, codes, cents = columns
+    if not months:
+        return {'months': [], 'income': [], 'expense': [], 'net': [], 'expense_change': [],
+                'expense_change_pct': [], 'categories': {}, 'forecast': None}
+
+    series = _series(months, expense, codes, cents, window)
+    n_months = len(series['income'])
+    first = series['first_month']
+
+    def money_or_none(values):
+        return [None if value is None else round(value / 100, 2) for value in values]
+
+    return {
+        'months': [month_label(first + i) for i in range(n_months)],
+        'income': _to_money(series['income']),
+        'expense': _to_money(series['expense']),
+        'net': _to_money([a - b for a, b in zip(series['income'], series['expense'])]),
+        'expense_change': money_or_none(series['expense_change']),
+        'expense_change_pct': [None if value is None else round(value, 2) for value in series['expense_change_pct']],
+        'categories': {
+            category: {
+                'expense': _to_money(series['category_expense'][code]),
+                'moving_average': money_or_none(series['moving_average'][code]),
+            }
+            for code, category in enumerate(CATEGORIES)
+        },
+        'forecast': {
+            'month': month_label(first + n_months),
+            'income': round(series['forecast']['income'] / 100, 2),
+            'expense': round(series['forecast']['expense'] / 100, 2),
+        },
+    }
+
+
+def get_trends(wallet, window=3):
+    """Trends for the wallet, cached until its version changes."""
+    cache = caches[ANALYTICS_CACHE_ALIAS]
+    key = f'analytics:{make_etag(wallet.pk, wallet.version, wallet.modified)}:{window}'
+    trends = cache.get(key)
+    if trends is None:
+        trends = compute_trends(load_columns(wallet), window)
+        cache.set(key, trends, ANALYTICS_CACHE_TIMEOUT)
+    return trends
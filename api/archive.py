@@ -0,0 +1,167 @@
+"""Hot/cold split of the transaction table.
+
+`archive_transactions` moves rows older than TRANSACTION_ARCHIVE_AFTER into
+TransactionArchive in batches, after writing balance checkpoints at the
+cutoff so ledger sums never need the moved rows. Balances and rollups are
+untouched: the rows move, nothing is added or removed.
+
+Reads stay on the hot table unless the requested date range starts before
+the latest cutoff. Then the matching archive rows are added with a
+CombinedQuerySet, a UNION ALL that still accepts the filter/order/slice
+calls the paginators and exports make.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from .checkpoints import create_checkpoints
+from .models import ArchiveRun, Transaction, TransactionArchive
+
+TRANSACTION_ARCHIVE_AFTER = getattr(settings, 'TRANSACTION_ARCHIVE_AFTER', timedelta(days=730))
+TRANSACTION_ARCHIVE_BATCH_SIZE = getattr(settings, 'TRANSACTION_ARCHIVE_BATCH_SIZE', 1000)
+ARCHIVE_FIELDS = [field.attname for field in Transaction._meta.concrete_fields]
+DEFAULT_ORDERING = ('-date', '-id')
+
+
+def get_archive_cutoff():
+    """Return the latest archive cutoff, or None if nothing was ever archived."""
+    return ArchiveRun.objects.order_by('-cutoff').values_list('cutoff', flat=True).first()
+
+
+async def aget_archive_cutoff():
+    """Async variant of `get_archive_cutoff`."""
+    return await ArchiveRun.objects.order_by('-cutoff').values_list('cutoff', flat=True).afirst()
+
+
+def reaches_archive(start, cutoff):
+    """Whether a range starting at `start` (None: unbounded) can include archived rows."""
+    return cutoff is not None and (start is None or start < cutoff)
+
+
+class CombinedQuerySet:
+    """Hot and archived rows read as one queryset.
+
+    filter(), exclude(), order_by(), values() and values_list() are applied
+    to both parts; counting, slicing and iterating run one UNION ALL of
+    them, ordered by `ordering` (newest first unless changed). The UNION
+    matches columns by position, so TransactionArchive must keep the
+    Transaction columns in the same order.
+    """
+
+    def __init__(self, hot, cold, ordering=DEFAULT_ORDERING):
+        self.hot = hot
+        self.cold = cold
+        self.ordering = ordering
+
+    @property
+    def parts(self):
+        return (self.hot, self.cold)
+
+    @property
+    def model(self):
+        return self.hot.model
+
+    @property
+    def ordered(self):
+        return bool(self.ordering)
+
+    def _chain(self, method, *args, **kwargs):
+        return CombinedQuerySet(
+            getattr(self.hot, method)(*args, **kwargs), getattr(self.cold, method)(*args, **kwargs), self.ordering,
+        )
+
+    def filter(self, *args, **kwargs):
+        return self._chain('filter', *args, **kwargs)
+
+    def exclude(self, *args, **kwargs):
+        return self._chain('exclude', *args, **kwargs)
+
+    def values(self, *fields):
+        return self._chain('values', *fields)
+
+    def values_list(self, *fields, **kwargs):
+        return self._chain('values_list', *fields, **kwargs)
+
+    def order_by(self, *ordering):
+        return CombinedQuerySet(self.hot, self.cold, ordering)
+
+    def union(self):
+        queryset = self.hot.order_by().union(self.cold.order_by(), all=True)
+        if self.ordering:
+            queryset = queryset.order_by(*self.ordering)
+        return queryset
+
+    def count(self):
+        return self.hot.count() + self.cold.count()
+
+    async def acount(self):
+        return await self.hot.acount() + await self.cold.acount()
+
+    def exists(self):
+        return self.hot.exists() or self.cold.exists()
+
+    def first(self):
+        return self.union().first()
+
+    async def afirst(self):
+        return await self.union().afirst()
+
+    def iterator(self, chunk_size=None):
+        return self.union().iterator(chunk_size=chunk_size)
+
+    def __getitem__(self, k):
+        return self.union()[k]
+
+    def __iter__(self):
+        return iter(self.union())
+
+    def __len__(self):
+        return len(self.union())
+
+
+def with_archive(queryset, archive_queryset, start, cutoff):
+    """Add `archive_queryset` to `queryset` when the range starting at `start` reaches the archive."""
+    if not reaches_archive(start, cutoff):
+        return queryset
+    return CombinedQuerySet(queryset, archive_queryset)
+
+
+def archive_transactions(cutoff=None, batch_size=None):
+    """Move transactions dated before `cutoff` into the archive; returns how many moved.
+
+    The cutoff defaults to TRANSACTION_ARCHIVE_AFTER ago. It is recorded
+    before any row moves, so reads already look in the archive while the
+    batches run. Each batch deletes and copies its rows in one transaction.
+    """
+    cutoff = cutoff or timezone.now() - TRANSACTION_ARCHIVE_AFTER
+    batch_size = batch_size or TRANSACTION_ARCHIVE_BATCH_SIZE
+    candidates = Transaction.objects.filter(date__lt=cutoff)
+
+    wallet_ids = list(candidates.order_by().values_list('wallet_id', flat=True).distinct())
+    if not wallet_ids:
+        return 0
+    create_checkpoints(cutoff, wallet_ids=wallet_ids, chunk_size=batch_size)
+    run = ArchiveRun.objects.create(cutoff=cutoff)
+
+    moved = 0
+    while True:
+        with db_transaction.atomic():
+            rows = list(candidates.order_by('pk').select_for_update().values(*ARCHIVE_FIELDS)[:batch_size])
+            if not rows:
+                break
+            # QuerySet._raw_delete is Django's fast-delete path (what the deletion
+            # Collector runs when no signals or cascades apply): one DELETE, with no
+            # instances loaded and no post_delete receivers. A move needs exactly
+            # that, because rollups, balances, checkpoints and sync tombstones must
+            # stay as they are. It is not public API; ArchiveTests in api/tests.py
+            # fail if its behaviour changes. Deleting first lets the search index
+            # triggers re-add each id for the archive.
+            candidates.filter(pk__in=[row['id'] for row in rows])._raw_delete(candidates.db)
+            TransactionArchive.objects.bulk_create([TransactionArchive(**row) for row in rows])
+        moved += len(rows)
+
+    run.moved = moved
+    run.save(update_fields=['moved'])
+    return moved
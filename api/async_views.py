@@ -0,0 +1,198 @@
+"""Async variants of the read-heavy API endpoints for ASGI deployments.
+
+DRF views are synchronous, so these are plain Django async views that
+use the async ORM and render with DRF's serializers and JSONRenderer to
+keep the payloads identical to the sync endpoints. Authentication
+accepts a token or a session.
+"""
+import functools
+
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import exceptions, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from accounts.authentication import ExpiringTokenAuthentication
+from .archive import DEFAULT_ORDERING, aget_archive_cutoff
+from .models import Transaction, TransactionArchive, Wallet
+from .reports import asummarize_rollups, aget_last_transaction, validate_and_adjust_dates
+from .rollups import get_rollups
+from .serialaizer import TransactionSerializer, WalletSerializer
+from .filters import TransactionFilter
+
+PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+
+def render(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(JSONRenderer().render(data), status=status_code, content_type='application/json')
+
+
+def async_login_required(view):
+    """Resolve `request.user` from a token or the session, or answer 401."""
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            result = await ExpiringTokenAuthentication().aauthenticate(request)
+        except exceptions.AuthenticationFailed as e:
+            return render({'detail': e.detail}, status.HTTP_401_UNAUTHORIZED)
+        user = result[0] if result else await request.auser()
+        if not user.is_authenticated:
+            return render(
+                {'detail': 'Authentication credentials were not provided.'}, status.HTTP_401_UNAUTHORIZED,
+            )
+        request.user = user
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def get_page_params(request):
+    """Same page/page_size handling as StandardResultsSetPagination."""
+    try:
+        page_size = min(int(request.GET.get('page_size', PAGE_SIZE)), MAX_PAGE_SIZE)
+        if page_size <= 0:
+            page_size = PAGE_SIZE
+    except ValueError:
+        page_size = PAGE_SIZE
+    page = request.GET.get('page', 1)
+    if page == 'last':
+        return page, page_size
+    try:
+        page = int(page)
+    except ValueError:
+        raise exceptions.NotFound('Invalid page.')
+    return page, page_size
+
+
+async def paginate(request, queryset, count):
+    """Return the page in the PageNumberPagination response shape, plus page info."""
+    page, page_size = get_page_params(request)
+    total_pages = max(1, -(-count // page_size))
+    if page == 'last':
+        page = total_pages
+    if page < 1 or page > total_pages:
+        raise exceptions.NotFound('Invalid page.')
+
+    offset = (page - 1) * page_size
+    rows = [row async for row in queryset[offset:offset + page_size]]
+
+    url = request.build_absolute_uri()
+    next_url = replace_query_param(url, 'page', page + 1) if page < total_pages else None
+    if page <= 1:
+        previous_url = None
+    elif page == 2:
+        previous_url = remove_query_param(url, 'page')
+    else:
+        previous_url = replace_query_param(url, 'page', page - 1)
+
+    data = {
+        'count': count,
+        'next': next_url,
+        'previous': previous_url,
+        'results': TransactionSerializer(rows, many=True).data,
+    }
+    info = {'current_page': page, 'total_pages': total_pages, 'total_items': count}
+    return data, info
+
+
+def filter_transactions(request, queryset, archive_queryset, cutoff):
+    filterset = TransactionFilter(request.GET, queryset=queryset)
+    if not filterset.is_valid():
+        raise ValidationError(filterset.errors)
+    return filterset.with_archive(archive_queryset, cutoff)
+
+
+@require_GET
+@async_login_required
+async def transaction_list(request):
+    """Async GET of TransactionListView."""
+    cutoff = await aget_archive_cutoff()
+    try:
+        queryset = filter_transactions(
+            request,
+            Transaction.objects.filter(wallet__user=request.user).order_by(*DEFAULT_ORDERING),
+            TransactionArchive.objects.filter(wallet__user=request.user),
+            cutoff,
+        )
+        count = await queryset.acount()
+        data, _ = await paginate(request, queryset, count)
+    except exceptions.APIException as e:
+        return render({'detail': e.detail}, e.status_code)
+    return render(data)
+
+
+@require_GET
+@async_login_required
+async def wallet_detail(request, pk):
+    """Async GET of WalletDetailView."""
+    try:
+        wallet = await Wallet.objects.aget(pk=pk, user=request.user)
+    except Wallet.DoesNotExist:
+        return render({'detail': 'No Wallet matches the given query.'}, status.HTTP_404_NOT_FOUND)
+    return render(WalletSerializer(wallet).data)
+
+
+@require_GET
+@async_login_required
+async def report(request):
+    """Async GET of ReportView.
+
+    The queries are awaited one after another: the async ORM runs them all
+    on the same thread-sensitive executor, so gathering them would not
+    overlap anything.
+    """
+    user = request.user
+    wallet = await Wallet.objects.filter(user=user).afirst()
+    if not wallet:
+        return render({'detail': 'Wallet not found.'}, status.HTTP_404_NOT_FOUND)
+
+    day = request.GET.get('day')
+    month = request.GET.get('month')
+    year = request.GET.get('year')
+    cutoff = await aget_archive_cutoff()
+    try:
+        queryset = filter_transactions(
+            request,
+            Transaction.objects.filter(wallet=wallet).order_by(*DEFAULT_ORDERING),
+            TransactionArchive.objects.filter(wallet=wallet),
+            cutoff,
+        )
+        validate_and_adjust_dates(day, month, year)
+    except ValidationError as e:
+        if isinstance(e.detail, dict):
+            return render(e.detail, status.HTTP_400_BAD_REQUEST)
+        return render({'detail': str(e)}, status.HTTP_400_BAD_REQUEST)
+
+    summary = await asummarize_rollups(get_rollups(wallet, day, month, year))
+    last_transaction = await aget_last_transaction(queryset)
+    try:
+        transaction_details, paginator_info = await paginate(request, queryset, await queryset.acount())
+    except exceptions.NotFound as e:
+        return render({'detail': e.detail}, e.status_code)
+
+    result = {
+        'income': summary['total_income'] or 0,
+        'expense': summary['total_expense'] or 0,
+        'balance': wallet.balance,
+        'income_count': summary['income_count'],
+        'expense_count': summary['expense_count'],
+        'total_transactions': summary['total_transactions'],
+        'date_range_summary': {
+            'total_income': summary['total_income'],
+            'total_expense': summary['total_expense'],
+        },
+        'user_info': {
+            'username': user.username,
+            'email': user.email,
+            'full_name': user.get_full_name()
+        },
+        'last_transaction': TransactionSerializer(last_transaction).data if last_transaction else None,
+        'transaction_categories': summary['transaction_categories'],
+        'transaction_details': transaction_details,
+        **paginator_info,
+    }
+    return render(result)
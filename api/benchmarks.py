@@ -0,0 +1,187 @@
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction as db_transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .cache import user_cache
+from .models import CustomUser, Wallet, Transaction
+from .rollups import rebuild_rollups
+from .users import provision_accounts
+
+BENCH_PASSWORD = 'bench-password'
+
+
+def seed(users=10, transactions=1000, days=730, batch_size=5000, seed_value=0):
+    """Create benchmark users with wallets, profiles and transactions using bulk inserts.
+
+    Transactions are spread evenly over the last `days` days. Returns the
+    created users; the first one is a superuser so it can open the admin.
+    """
+    rng = random.Random(seed_value)
+    password = make_password(BENCH_PASSWORD)  # Hash once, reuse for every user
+
+    with db_transaction.atomic():
+        created_users = CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'bench{i}', email=f'bench{i}@example.com', password=password,
+                is_staff=(i == 0), is_superuser=(i == 0),
+            )
+            for i in range(users)
+        ])
+        wallets = provision_accounts(created_users)
+
+    categories = [choice for choice, _ in Transaction.CATEGORY_CHOICES]
+    balances = {wallet.pk: Decimal('0') for wallet in wallets}
+    now = timezone.now()
+    per_day = -(-transactions // days)  # Round up so everything fits in `days`
+    remaining = transactions
+    for day in range(days):
+        count = min(per_day, remaining)
+        if not count:
+            break
+        rows = []
+        for _ in range(count):
+            wallet = rng.choice(wallets)
+            transaction_type = 'income' if rng.random() < 0.4 else 'expense'
+            amount = Decimal(rng.randint(100, 50000)) / 100
+            balances[wallet.pk] += amount if transaction_type == 'income' else -amount
+            rows.append(Transaction(
+                wallet=wallet, amount=amount, transaction_type=transaction_type,
+                category=rng.choice(categories), description=f'bench {rng.randint(0, 10 ** 6)}',
+            ))
+        with db_transaction.atomic():
+            created = Transaction.objects.bulk_create(rows, batch_size=batch_size)
+            # `date` is auto_now_add, so backdate the day's rows afterwards
+            Transaction.objects.filter(pk__gte=created[0].pk, pk__lte=created[-1].pk).update(
+                date=now - timedelta(days=day, minutes=rng.randint(0, 1439)),
+            )
+        remaining -= count
+
+    for wallet in wallets:
+        wallet.balance = balances[wallet.pk]
+    Wallet.objects.bulk_update(wallets, ['balance'], batch_size=batch_size)
+    rebuild_rollups()
+    return created_users
+
+
+def summarize(timings):
+    timings = sorted(timings)
+
+    def pick(q):
+        return timings[min(len(timings) - 1, int(q * len(timings)))]
+
+    return {
+        'runs': len(timings),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 3),
+        'p50_ms': round(pick(0.50) * 1000, 3),
+        'p95_ms': round(pick(0.95) * 1000, 3),
+        'p99_ms': round(pick(0.99) * 1000, 3),
+    }
+
+
+def measure(client, method, path, repeat=20, data=None, cold_user=None):
+    """Time `repeat` requests with the Django test client.
+
+    With `cold_user` that user's cached responses are dropped before each
+    request, so the view does its full work every time.
+    """
+    timings = []
+    queries = 0
+    status_code = None
+    for _ in range(repeat):
+        if cold_user is not None:
+            user_cache.invalidate(cold_user.pk)
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = getattr(client, method)(path, data=data)
+            timings.append(time.perf_counter() - start)
+        queries = len(captured.captured_queries)
+        status_code = response.status_code
+    return {'status': status_code, 'queries': queries, **summarize(timings)}
+
+
+def load(user, method, path, concurrency=8, requests=200, data=None):
+    """Hit an endpoint from `concurrency` threads, each with its own client."""
+    timings = []
+    errors = 0
+    lock = threading.Lock()
+    per_worker = max(1, requests // concurrency)
+
+    def worker():
+        nonlocal errors
+        client = Client()
+        client.force_login(user)
+        local = []
+        failed = 0
+        for _ in range(per_worker):
+            start = time.perf_counter()
+            response = getattr(client, method)(path, data=data)
+            local.append(time.perf_counter() - start)
+            failed += response.status_code >= 400
+        connection.close()
+        with lock:
+            timings.extend(local)
+            errors += failed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - start
+    return {
+        'concurrency': concurrency,
+        'errors': errors,
+        'throughput_rps': round(len(timings) / elapsed, 2),
+        **summarize(timings),
+    }
+
+
+# (name, method, path, data, cold cache)
+BENCHMARKS = [
+    ('reports', 'get', '/api/reports/', None, True),
+    ('reports_cached', 'get', '/api/reports/', None, False),
+    ('reports_year', 'get', '/api/reports/?year={year}', None, True),
+    ('reports_cursor', 'get', '/api/reports/?pagination=cursor', None, True),
+    ('transactions_list', 'get', '/api/transactions/', None, False),
+    ('transactions_create', 'post', '/api/transactions/', {'amount': '1.00', 'transaction_type': 'income'}, False),
+    ('admin_transactions', 'get', '/admin/api/transaction/', None, False),
+    ('admin_wallets', 'get', '/admin/api/wallet/', None, False),
+    ('admin_profiles', 'get', '/admin/api/userprofile/', None, False),
+    ('admin_users', 'get', '/admin/api/customuser/', None, False),
+]
+
+LOAD_BENCHMARKS = ['reports', 'transactions_list', 'transactions_create']
+
+
+def run(user, repeat=20, concurrency=8, load_requests=200):
+    """Run every benchmark as `user` and return the results keyed by name."""
+    client = Client()
+    client.force_login(user)
+    year = timezone.now().year
+    results = {}
+    for name, method, path, data, cold in BENCHMARKS:
+        results[name] = measure(
+            client, method, path.format(year=year), repeat, data, cold_user=user if cold else None,
+        )
+
+    results['login'] = measure(
+        Client(), 'post', '/accounts/login/', repeat,
+        {'username': user.username, 'password': BENCH_PASSWORD},
+    )
+
+    if concurrency:
+        for name, method, path, data, cold in BENCHMARKS:
+            if name in LOAD_BENCHMARKS:
+                results[f'{name}_load'] = load(
+                    user, method, path.format(year=year), concurrency, load_requests, data,
+                )
+    return results
@@ -0,0 +1,72 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+USER_CACHE_ALIAS = getattr(settings, 'USER_CACHE_ALIAS', 'user_data')
+USER_CACHE_TIMEOUT = getattr(settings, 'USER_CACHE_TIMEOUT', 60 * 5)
+
+
+class UserCache:
+    """Cache of per-user API payloads, dropped as a whole when the user's data changes.
+
+    Each user has a version stamp stored in the cache, and every entry key
+    contains it. Invalidating a user writes a new stamp, so old entries are
+    never read again and age out of the backend (LocMemCache evicts the
+    least recently used entries once MAX_ENTRIES is reached).
+    """
+
+    def __init__(self, alias=USER_CACHE_ALIAS, timeout=USER_CACHE_TIMEOUT):
+        self.alias = alias
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _version_key(self, user_id):
+        return f'user-version:{user_id}'
+
+    def _get_version(self, user_id):
+        version = self.cache.get(self._version_key(user_id))
+        if version is None:
+            version = time.time_ns()
+            self.cache.set(self._version_key(user_id), version, None)
+        return version
+
+    def make_key(self, user_id, namespace, params):
+        digest = hashlib.md5(str(params).encode()).hexdigest()
+        return f'user:{user_id}:{self._get_version(user_id)}:{namespace}:{digest}'
+
+    def get(self, user_id, namespace, params):
+        value = self.cache.get(self.make_key(user_id, namespace, params))
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, user_id, namespace, params, value):
+        self.cache.set(self.make_key(user_id, namespace, params), value, self.timeout)
+
+    def invalidate(self, user_id):
+        self.cache.set(self._version_key(user_id), time.time_ns(), None)
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / total if total else 0,
+        }
+
+
+user_cache = UserCache()
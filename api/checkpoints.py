@@ -0,0 +1,98 @@
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .ledger import signed_sum
+from .models import BalanceCheckpoint, Transaction, TransactionArchive, Wallet
+
+CENTS = Decimal('0.01')
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def annotate_ledger_balance(wallets, as_of=None):
+    """Annotate wallets with `ledger_balance`, the sum of their transactions before `as_of`.
+
+    Starts from the nearest checkpoint at or before `as_of` and only adds
+    the transactions after it, all in one query. Without `as_of` every
+    transaction counts.
+    """
+    checkpoints = BalanceCheckpoint.objects.filter(wallet=OuterRef('pk'))
+    if as_of is not None:
+        checkpoints = checkpoints.filter(as_of__lte=as_of)
+    checkpoints = checkpoints.order_by('-as_of')
+
+    def deltas(model):
+        rows = model.objects.filter(
+            wallet=OuterRef('pk'),
+            date__gte=Coalesce(OuterRef('checkpoint_as_of'), Value(EPOCH)),
+        )
+        if as_of is not None:
+            rows = rows.filter(date__lt=as_of)
+        rows = rows.order_by().values('wallet').annotate(total=signed_sum()).values('total')
+        return Coalesce(Subquery(rows), Value(0), output_field=output_field)
+
+    output_field = DecimalField(max_digits=14, decimal_places=2)
+    return wallets.annotate(
+        checkpoint_as_of=Subquery(checkpoints.values('as_of')[:1]),
+        checkpoint_balance=Coalesce(
+            Subquery(checkpoints.values('balance')[:1]), Value(0), output_field=output_field,
+        ),
+    ).annotate(
+        # Archived rows count too; a checkpoint at the archive cutoff leaves none to add
+        ledger_balance=ExpressionWrapper(
+            F('checkpoint_balance') + deltas(Transaction) + deltas(TransactionArchive),
+            output_field=output_field,
+        ),
+    )
+
+
+def balance_as_of(wallet, as_of):
+    """Return the wallet's balance just before `as_of` according to its transactions."""
+    wallets = annotate_ledger_balance(Wallet.objects.filter(pk=wallet.pk), as_of)
+    return to_cents(wallets.values_list('ledger_balance', flat=True).get())
+
+
+def to_cents(value):
+    # SQLite does the sums in floating point, so round back to the field's precision
+    return Decimal(value).quantize(CENTS)
+
+
+def create_checkpoints(as_of, wallet_ids=None, chunk_size=1000):
+    """Store the ledger balance of each wallet as of `as_of`.
+
+    Wallets whose balance did not change since their last checkpoint are
+    skipped, since that checkpoint still answers the same. Returns the
+    number of checkpoints written.
+    """
+    wallets = Wallet.objects.order_by('pk')
+    if wallet_ids is not None:
+        wallets = wallets.filter(pk__in=wallet_ids)
+    wallets = annotate_ledger_balance(wallets, as_of).values_list(
+        'pk', 'checkpoint_as_of', 'checkpoint_balance', 'ledger_balance',
+    )
+
+    written = 0
+    batch = []
+    for pk, checkpoint_as_of, checkpoint_balance, ledger_balance in wallets.iterator(chunk_size=chunk_size):
+        if checkpoint_as_of is not None and (checkpoint_as_of == as_of or checkpoint_balance == to_cents(ledger_balance)):
+            continue
+        batch.append(BalanceCheckpoint(wallet_id=pk, as_of=as_of, balance=to_cents(ledger_balance)))
+        if len(batch) >= chunk_size:
+            written += len(BalanceCheckpoint.objects.bulk_create(batch, ignore_conflicts=True))
+            batch = []
+    if batch:
+        written += len(BalanceCheckpoint.objects.bulk_create(batch, ignore_conflicts=True))
+    return written
+
+
+def find_drift(wallet_ids):
+    """Return (wallet id, balance, ledger balance) for wallets whose balance disagrees with the ledger."""
+    wallets = annotate_ledger_balance(Wallet.objects.filter(pk__in=wallet_ids))
+    drift = []
+    for pk, balance, ledger_balance in wallets.values_list('pk', 'balance', 'ledger_balance'):
+        ledger_balance = to_cents(ledger_balance)
+        if balance != ledger_balance:
+            drift.append((pk, balance, ledger_balance))
+    return drift
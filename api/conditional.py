@@ -0,0 +1,40 @@
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .models import Wallet
+
+
+def make_etag(wallet_id, version, modified):
+    return quote_etag(f'{wallet_id}.{version}.{int(modified.timestamp() * 1000000)}')
+
+
+class ConditionalGetMixin:
+    """Answer GET with 304 Not Modified while the owner's wallet version is unchanged.
+
+    The validators come from one indexed lookup of the wallet's `version`
+    and `modified`, which every change to the user's transactions, wallet,
+    profile or account details bumps. A match returns before any report
+    query or serializer runs; otherwise the response gets ETag and
+    Last-Modified. Only If-None-Match can produce a 304: Last-Modified has
+    one-second resolution, so two changes within a second would look alike.
+    """
+
+    def get_validator_queryset(self):
+        return Wallet.objects.filter(user=self.request.user)
+
+    def get(self, request, *args, **kwargs):
+        row = self.get_validator_queryset().values_list('pk', 'version', 'modified').first()
+        if row is None:
+            return super().get(request, *args, **kwargs)
+
+        etag = make_etag(*row)
+        self.validator_etag = etag  # Also versions the UserCacheMixin key
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(int(row[2].timestamp()))
+        return response
@@ -0,0 +1,34 @@
+from datetime import date, datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def get_date_bounds(year, month=None, day=None):
+    """Return the half-open [start, end) date range for a year, month or day.
+
+    Raises ValueError if the values do not form a valid date.
+    """
+    year = int(year)
+    if day:
+        start = date(year, int(month), int(day))
+        return start, start + timedelta(days=1)
+    if month:
+        start = date(year, int(month), 1)
+        if start.month == 12:
+            return start, date(year + 1, 1, 1)
+        return start, date(year, start.month + 1, 1)
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+def get_datetime_range(year, month=None, day=None, tz=None):
+    """Same as `get_date_bounds`, as aware datetimes at midnight in `tz`.
+
+    Defaults to the active timezone, which is what the `date__year` style
+    lookups used.
+    """
+    tz = tz or timezone.get_current_timezone()
+    start, end = get_date_bounds(year, month, day)
+    return (
+        timezone.make_aware(datetime.combine(start, time.min), tz),
+        timezone.make_aware(datetime.combine(end, time.min), tz),
+    )
@@ -0,0 +1,27 @@
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# PRAGMA values are interpolated, so only these names and plain values are allowed
+SQLITE_PRAGMAS = ('journal_mode', 'synchronous', 'mmap_size', 'busy_timeout', 'cache_size', 'temp_store')
+PRAGMA_VALUE = re.compile(r'-?\d+|[A-Za-z]+')  # e.g. cache_size=-64000 (KiB) or journal_mode=wal
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender=None, connection=None, **kwargs):
+    """Run the PRAGMAS of the database settings on each new SQLite connection.
+
+    WAL lets readers run alongside the single writer, synchronous=NORMAL
+    is safe with WAL and avoids an fsync per commit, and mmap_size lets
+    reads come straight from the page cache.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = connection.settings_dict.get('PRAGMAS') or {}
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            if name not in SQLITE_PRAGMAS or not PRAGMA_VALUE.fullmatch(str(value)):
+                raise ImproperlyConfigured(f"Unsupported SQLite pragma {name}={value!r}.")
+            cursor.execute(f'PRAGMA {name} = {value}')
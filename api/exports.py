@@ -0,0 +1,50 @@
+import csv
+import json
+
+from django.conf import settings
+from django.utils import timezone
+
+EXPORT_FIELDS = ('id', 'amount', 'transaction_type', 'category', 'description', 'date')
+EXPORT_CHUNK_SIZE = getattr(settings, 'TRANSACTION_EXPORT_CHUNK_SIZE', 2000)
+
+
+class Echo:
+    """File-like object that hands each written line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def format_date(value):
+    # Same representation as DRF's DateTimeField
+    value = timezone.localtime(value).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def iter_rows(queryset, chunk_size=None):
+    """Yield plain tuples of the export fields, oldest first, in constant memory."""
+    rows = queryset.order_by('date', 'id').values_list(*EXPORT_FIELDS)
+    for pk, amount, transaction_type, category, description, date in rows.iterator(
+        chunk_size=chunk_size or EXPORT_CHUNK_SIZE
+    ):
+        yield pk, str(amount), transaction_type, category, description, format_date(date)
+
+
+def iter_csv(queryset, chunk_size=None):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in iter_rows(queryset, chunk_size):
+        yield writer.writerow(row)
+
+
+def iter_ndjson(queryset, chunk_size=None):
+    for row in iter_rows(queryset, chunk_size):
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (iter_csv, 'text/csv'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+}
@@ -0,0 +1,76 @@
+from django_filters import rest_framework as filters, utils
+from rest_framework.exceptions import ValidationError
+
+from .archive import get_archive_cutoff, with_archive
+from .dates import get_datetime_range
+from .models import Transaction
+
+
+# Filter for transactions
+class TransactionFilter(filters.FilterSet):
+    day = filters.NumberFilter(method='filter_date')
+    month = filters.NumberFilter(method='filter_date')
+    year = filters.NumberFilter(method='filter_date')
+
+    class Meta:
+        model = Transaction
+        fields = ['day', 'month', 'year']
+
+    def filter_date(self, queryset, name, value):
+        # day/month/year are applied together in filter_queryset
+        return queryset
+
+    def get_date_range(self):
+        """Return the [start, end) datetimes of the requested dates, or None when unbounded."""
+        day = self.form.cleaned_data.get('day')
+        month = self.form.cleaned_data.get('month')
+        year = self.form.cleaned_data.get('year')
+        if year and (month or not day):
+            try:
+                return get_datetime_range(year, month, day)
+            except ValueError as e:
+                raise ValidationError({"detail": str(e)})
+        return None
+
+    def filter_queryset(self, queryset):
+        """Turn day/month/year into a `date >= start AND date < end` range."""
+        queryset = super().filter_queryset(queryset)
+        date_range = self.get_date_range()
+        if date_range is not None:
+            start, end = date_range
+            return queryset.filter(date__gte=start, date__lt=end)
+
+        # Partial combinations cannot be expressed as a single range
+        day = self.form.cleaned_data.get('day')
+        month = self.form.cleaned_data.get('month')
+        year = self.form.cleaned_data.get('year')
+        lookups = {'date__day': day, 'date__month': month, 'date__year': year}
+        return queryset.filter(**{k: v for k, v in lookups.items() if v is not None})
+
+    def with_archive(self, archive_queryset, cutoff):
+        """`self.qs`, plus the matching archived rows when the requested dates reach before `cutoff`."""
+        date_range = self.get_date_range()
+        start = date_range[0] if date_range is not None else None
+        return with_archive(self.qs, self.filter_queryset(archive_queryset), start, cutoff)
+
+
+class ArchiveFilterBackend(filters.DjangoFilterBackend):
+    """DjangoFilterBackend that also reads the archive when the filtered dates reach into it.
+
+    The view provides the archived rows it may see with `get_archive_queryset()`.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        filterset = self.get_filterset(request, queryset, view)
+        if filterset is None:
+            return queryset
+        if not filterset.is_valid() and self.raise_exception:
+            raise utils.translate_validation(filterset.errors)
+        return filterset.with_archive(view.get_archive_queryset(), get_archive_cutoff())
+
+
+class TransactionSearchFilter(TransactionFilter):
+    category = filters.ChoiceFilter(choices=Transaction.CATEGORY_CHOICES)
+
+    class Meta(TransactionFilter.Meta):
+        fields = ['day', 'month', 'year', 'category']
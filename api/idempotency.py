@@ -0,0 +1,152 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files import File
+from django.db import IntegrityError, transaction as db_transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.status import is_success
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_KEY_TTL = getattr(settings, 'IDEMPOTENCY_KEY_TTL', timedelta(hours=24))
+IDEMPOTENCY_CACHE_ALIAS = getattr(settings, 'IDEMPOTENCY_CACHE_ALIAS', 'default')
+MAX_KEY_LENGTH = 255
+
+
+class FingerprintEncoder(JSONEncoder):
+    """JSONEncoder that also accepts uploaded files, by name and size."""
+
+    def default(self, obj):
+        if isinstance(obj, File):
+            return [obj.name, obj.size]
+        return super().default(obj)
+
+
+def get_fingerprint(request):
+    """Hash of what the key is bound to, so reusing it for another request is detected.
+
+    Covers the method, the path with its query string and the parsed body
+    as canonical JSON, so equal data sent with other formatting or key
+    order still matches. Reading `request.data` instead of the raw body
+    also works for multipart uploads.
+    """
+    data = request.data
+    if hasattr(data, 'lists'):  # QueryDict of a form or multipart body
+        data = dict(data.lists())
+    body = json.dumps(data, cls=FingerprintEncoder, sort_keys=True, separators=(',', ':'))
+    digest = hashlib.sha256()
+    for part in (request.method, request.get_full_path(), body):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def cache_key(user_id, key):
+    return f'idempotency:{user_id}:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def get_stored_response(user_id, key):
+    """Return (fingerprint, status_code, body) stored for the key, or None.
+
+    Looks in the cache first and falls back to the table, which is the
+    source of truth. Expired rows are ignored.
+    """
+    cache = caches[IDEMPOTENCY_CACHE_ALIAS]
+    stored = cache.get(cache_key(user_id, key))
+    if stored is not None:
+        return stored
+    row = IdempotencyKey.objects.filter(
+        user_id=user_id, key=key, expires_at__gt=timezone.now(),
+    ).values_list('fingerprint', 'status_code', 'body', 'expires_at').first()
+    if row is None:
+        return None
+    fingerprint, status_code, body, expires_at = row
+    stored = (fingerprint, status_code, body)
+    cache.set(cache_key(user_id, key), stored, (expires_at - timezone.now()).total_seconds())
+    return stored
+
+
+def store_response(user_id, key, fingerprint, response):
+    """Record a successful response; must run in the atomic block that did the write."""
+    IdempotencyKey.objects.filter(user_id=user_id, key=key, expires_at__lte=timezone.now()).delete()
+    IdempotencyKey.objects.create(
+        user_id=user_id,
+        key=key,
+        fingerprint=fingerprint,
+        status_code=response.status_code,
+        body=response.data,
+        expires_at=timezone.now() + IDEMPOTENCY_KEY_TTL,
+    )
+    stored = (fingerprint, response.status_code, response.data)
+    db_transaction.on_commit(lambda: caches[IDEMPOTENCY_CACHE_ALIAS].set(
+        cache_key(user_id, key), stored, IDEMPOTENCY_KEY_TTL.total_seconds(),
+    ))
+
+
+def purge_expired(batch_size=1000):
+    """Delete expired keys in batches; returns how many were removed."""
+    deleted = 0
+    while True:
+        pks = list(
+            IdempotencyKey.objects.filter(expires_at__lte=timezone.now())
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=pks).delete()[0]
+
+
+class IdempotentCreateMixin:
+    """Honour an `Idempotency-Key` header on POST, which is handled by `create()`.
+
+    The first successful response for a key is stored in the same atomic
+    block as the write it describes. Retries with the same key get that
+    response back without running the view again, and concurrent requests
+    with the same key lose on the unique constraint and replay the winner.
+    Requests without the header behave as before.
+    """
+
+    def post(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return self.create(request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"detail": f"{IDEMPOTENCY_HEADER} must be 1 to {MAX_KEY_LENGTH} characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        user_id = request.user.pk
+        fingerprint = get_fingerprint(request)
+        stored = get_stored_response(user_id, key)
+        if stored is None:
+            try:
+                with db_transaction.atomic():
+                    response = self.create(request, *args, **kwargs)
+                    if is_success(response.status_code):
+                        store_response(user_id, key, fingerprint, response)
+                    return response
+            except IntegrityError:
+                # Another request with the same key committed first
+                stored = get_stored_response(user_id, key)
+                if stored is None:
+                    raise
+        return self.replay(stored, fingerprint)
+
+    def replay(self, stored, fingerprint):
+        stored_fingerprint, status_code, body = stored
+        if stored_fingerprint != fingerprint:
+            return Response(
+                {"detail": f"{IDEMPOTENCY_HEADER} was already used for a different request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        response = Response(body, status=status_code)
+        response['Idempotent-Replayed'] = 'true'
+        return response
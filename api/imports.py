@@ -0,0 +1,99 @@
+import codecs
+import csv
+import json
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from .cache import user_cache
+from .ledger import apply_delta, signed_amount
+from .models import Transaction
+from .rollups import add_to_rollups
+from .serialaizer import TransactionSerializer
+
+IMPORT_BATCH_SIZE = getattr(settings, 'TRANSACTION_IMPORT_BATCH_SIZE', 1000)
+
+
+def read_json(stream, encoding='utf-8'):
+    """Read a JSON array of transaction rows."""
+    try:
+        rows = json.load(codecs.getreader(encoding)(stream))
+    except ValueError as e:
+        raise ParseError(f"JSON parse error - {e}")
+    if not isinstance(rows, list):
+        raise ParseError("Expected a JSON array of rows.")
+    return rows
+
+
+def read_ndjson(stream, encoding='utf-8'):
+    """Read one JSON object per line, skipping blank lines."""
+    rows = []
+    for number, line in enumerate(codecs.getreader(encoding)(stream), start=1):
+        if not line.strip():
+            continue
+        try:
+            rows.append(json.loads(line))
+        except ValueError as e:
+            raise ParseError(f"NDJSON parse error on line {number} - {e}")
+    return rows
+
+
+def read_csv(stream, encoding='utf-8'):
+    """Read CSV rows with a header line naming the transaction fields."""
+    return list(csv.DictReader(codecs.getreader(encoding)(stream)))
+
+
+READERS = {
+    'json': read_json,
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
+
+
+class CSVParser(BaseParser):
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return read_csv(stream, (parser_context or {}).get('encoding', 'utf-8'))
+
+
+class NDJSONParser(BaseParser):
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return read_ndjson(stream, (parser_context or {}).get('encoding', 'utf-8'))
+
+
+def validate_rows(rows):
+    """Validate all rows in one pass.
+
+    Returns (validated_data, errors) where errors maps row index to the
+    serializer errors of that row.
+    """
+    serializer = TransactionSerializer(data=rows, many=True)
+    if serializer.is_valid():
+        return serializer.validated_data, {}
+    errors = {index: row_errors for index, row_errors in enumerate(serializer.errors) if row_errors}
+    return None, errors
+
+
+def import_transactions(wallet, validated_rows, batch_size=None):
+    """Insert validated rows for a wallet with batched `bulk_create`.
+
+    The wallet balance is changed once by the net amount of all rows and
+    the rollups once per bucket, all in the same atomic block. Raises
+    InsufficientBalance if the net amount would take the wallet below zero.
+    """
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    transactions = [Transaction(wallet=wallet, **row) for row in validated_rows]
+    delta = sum(signed_amount(t.transaction_type, t.amount) for t in transactions)
+
+    with db_transaction.atomic():
+        apply_delta(wallet, delta, check_balance=True)
+        created = Transaction.objects.bulk_create(transactions, batch_size=batch_size)
+        add_to_rollups(created)
+    # bulk_create and the F() balance update do not send post_save
+    user_cache.invalidate(wallet.user_id)
+    return created
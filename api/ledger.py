@@ -0,0 +1,54 @@
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+class InsufficientBalance(Exception):
+    """Raised when an expense would take a wallet below zero."""
+
+
+def signed_amount(transaction_type, amount):
+    """Return the balance delta of a transaction: +amount for income, -amount for expense."""
+    if transaction_type == 'income':
+        return amount
+    if transaction_type == 'expense':
+        return -amount
+    return 0
+
+
+def signed_sum(prefix=''):
+    """Aggregate of income minus expense amounts, 0 when there are no rows.
+
+    `prefix` points at the transaction relation, e.g. 'transactions__'.
+    """
+    output_field = DecimalField(max_digits=14, decimal_places=2)
+    amount = F(f'{prefix}amount')
+    return Coalesce(
+        Sum(Case(
+            When(**{f'{prefix}transaction_type': 'income'}, then=amount),
+            When(**{f'{prefix}transaction_type': 'expense'}, then=-amount),
+            default=Value(0),
+            output_field=output_field,
+        )),
+        Value(0),
+        output_field=output_field,
+    )
+
+
+def apply_delta(wallet, delta, check_balance=False):
+    """Atomically add `delta` to the wallet balance in a single UPDATE.
+
+    Runs `UPDATE ... SET balance = balance + delta`, so concurrent writers
+    never overwrite each other. The same UPDATE bumps `version` and
+    `modified`, marking the wallet's data as changed for conditional GETs,
+    so it also runs for a zero delta. With `check_balance` the UPDATE only
+    matches when the balance covers the delta, and InsufficientBalance is
+    raised otherwise. The in-memory wallet is refreshed so a later `save()`
+    does not write back a stale balance.
+    """
+    wallets = type(wallet).objects.filter(pk=wallet.pk)
+    if check_balance and delta < 0:
+        wallets = wallets.filter(balance__gte=-delta)
+    if not wallets.update(balance=F('balance') + delta, version=F('version') + 1, modified=timezone.now()):
+        raise InsufficientBalance("Insufficient balance in the wallet for this expense.")
+    wallet.refresh_from_db(fields=['balance', 'version', 'modified'])
@@ -0,0 +1,32 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from api.archive import TRANSACTION_ARCHIVE_AFTER, TRANSACTION_ARCHIVE_BATCH_SIZE, archive_transactions
+
+
+class Command(BaseCommand):
+    help = 'Move old transactions into the archive table (meant to run periodically, e.g. monthly).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before',
+            help='Archive transactions dated before this day, YYYY-MM-DD '
+                 f'(default: {TRANSACTION_ARCHIVE_AFTER.days} days ago).',
+        )
+        parser.add_argument('--batch-size', type=int, default=TRANSACTION_ARCHIVE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['before']:
+            day = parse_date(options['before'])
+            if day is None:
+                raise CommandError(f"Invalid date '{options['before']}'.")
+        else:
+            day = timezone.localdate() - TRANSACTION_ARCHIVE_AFTER
+        # Whole days keep the cutoff aligned with the daily rollups
+        cutoff = timezone.make_aware(datetime.combine(day, time.min))
+
+        moved = archive_transactions(cutoff, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} transactions dated before {day.isoformat()}.'))
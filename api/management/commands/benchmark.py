@@ -0,0 +1,89 @@
+import json
+import os
+import platform
+import tempfile
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from api import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database and benchmark the API endpoints. '
+        'Results are written as JSON so runs can be compared.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--transactions', type=int, default=1000, help='Total transactions (10^3 to 10^6).')
+        parser.add_argument('--days', type=int, default=730, help='Spread transactions over this many days.')
+        parser.add_argument('--repeat', type=int, default=20, help='Sequential requests per endpoint.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Threads for the load runs (0 to skip).')
+        parser.add_argument('--load-requests', type=int, default=200, help='Total requests per load run.')
+        parser.add_argument('--output', default='bench_output.json', help='Where to write the JSON results.')
+        parser.add_argument('--compare', help='Previous results file to compare against.')
+
+    def handle(self, *args, **options):
+        previous = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    previous = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read {options['compare']}: {e}")
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+            # A file database so the load threads share the data
+            test_settings['NAME'] = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(
+                f"Seeding {options['users']} users and {options['transactions']} transactions..."
+            )
+            users = benchmarks.seed(options['users'], options['transactions'], options['days'])
+            self.stdout.write('Running benchmarks...')
+            results = benchmarks.run(
+                users[0], options['repeat'], options['concurrency'], options['load_requests'],
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'created': timezone.now().isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'debug': settings.DEBUG,
+            },
+            'data': {
+                'users': options['users'],
+                'transactions': options['transactions'],
+                'days': options['days'],
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+
+        for name, result in results.items():
+            line = f"{name:24} p50 {result['p50_ms']:9.2f}ms  p95 {result['p95_ms']:9.2f}ms"
+            if 'queries' in result:
+                line += f"  queries {result['queries']:3}"
+            if 'throughput_rps' in result:
+                line += f"  {result['throughput_rps']:8.1f} req/s"
+            old = (previous or {}).get('results', {}).get(name)
+            if old and old.get('p50_ms'):
+                line += f"  ({result['p50_ms'] / old['p50_ms']:.2f}x p50 vs previous)"
+            self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
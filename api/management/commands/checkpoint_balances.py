@@ -0,0 +1,31 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api.checkpoints import create_checkpoints
+
+
+class Command(BaseCommand):
+    help = 'Store a balance checkpoint per wallet (meant to run periodically, e.g. daily).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--as-of',
+            help='Checkpoint time as an ISO datetime (default: the start of today).',
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['as_of']:
+            as_of = parse_datetime(options['as_of'])
+            if as_of is None:
+                raise CommandError(f"Invalid datetime '{options['as_of']}'.")
+            if timezone.is_naive(as_of):
+                as_of = timezone.make_aware(as_of)
+        else:
+            as_of = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+
+        written = create_checkpoints(as_of, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} checkpoints as of {as_of.isoformat()}.'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections
+
+from api.db import SQLITE_PRAGMAS
+
+
+class Command(BaseCommand):
+    help = 'Connect with the configured database profile and print the settings in effect.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        settings_dict = connection.settings_dict
+        try:
+            connection.ensure_connection()
+        except DatabaseError as e:
+            raise CommandError(f"Cannot connect to {settings_dict['NAME']}: {e}")
+
+        self.stdout.write(f"vendor        {connection.vendor}")
+        self.stdout.write(f"name          {settings_dict['NAME']}")
+        self.stdout.write(f"conn_max_age  {settings_dict['CONN_MAX_AGE']}")
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                for name in SQLITE_PRAGMAS:
+                    cursor.execute(f'PRAGMA {name}')
+                    self.stdout.write(f"{name:13} {cursor.fetchone()[0]}")
+            elif connection.vendor == 'postgresql':
+                if settings_dict['OPTIONS'].get('pool'):
+                    pool = 'native'
+                elif settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'):
+                    pool = 'pgbouncer'
+                else:
+                    pool = 'none'
+                self.stdout.write(f"pool          {pool}")
+                for name in ('server_version', 'max_connections', 'synchronous_commit'):
+                    cursor.execute(f'SHOW {name}')
+                    self.stdout.write(f"{name:13} {cursor.fetchone()[0]}")
@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ParseError
+
+from api.imports import READERS
+from api.users import create_users, validate_user_rows
+
+
+class Command(BaseCommand):
+    help = 'Create users with their wallets and profiles from a JSON array, CSV or NDJSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for stdin.")
+        parser.add_argument('--format', choices=sorted(READERS), help='Input format (default: from the file extension).')
+        parser.add_argument('--batch-size', type=int, default=None, help='Users per bulk insert.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if file_format not in READERS:
+            raise CommandError(f"Unknown format '{file_format}', use --format.")
+
+        try:
+            if path == '-':
+                rows = READERS[file_format](sys.stdin.buffer)
+            else:
+                with open(path, 'rb') as stream:
+                    rows = READERS[file_format](stream)
+        except (OSError, ParseError) as e:
+            raise CommandError(str(e))
+
+        validated_rows, errors = validate_user_rows(rows)
+        if errors:
+            for index, row_errors in errors.items():
+                self.stderr.write(f"Row {index + 1}: {row_errors}")
+            raise CommandError(f"{len(errors)} invalid rows, nothing imported.")
+
+        created = create_users(validated_rows, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Created {len(created)} users with wallets and profiles."))
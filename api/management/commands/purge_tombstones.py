@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.sync import purge_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Delete transaction tombstones older than SYNC_TOKEN_MAX_AGE.'
+
+    def handle(self, *args, **options):
+        deleted = purge_tombstones()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstones.'))
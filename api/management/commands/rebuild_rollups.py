@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily transaction rollups from the raw transactions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--wallet', type=int, action='append', dest='wallets',
+            help='Only rebuild the given wallet id (can be repeated).',
+        )
+
+    def handle(self, *args, **options):
+        written = rebuild_rollups(options['wallets'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} rollup rows.'))
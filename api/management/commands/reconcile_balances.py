@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import F
+from django.utils import timezone
+
+from api.cache import user_cache
+from api.checkpoints import find_drift
+from api.models import Wallet
+
+
+def check_chunk(wallet_ids):
+    try:
+        return find_drift(wallet_ids)
+    finally:
+        connections.close_all()  # Each worker thread has its own connection
+
+
+class Command(BaseCommand):
+    help = 'Verify every Wallet.balance against its checkpoints and transactions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Chunks checked in parallel.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Wallets per chunk.')
+        parser.add_argument('--fix', action='store_true', help='Set drifted balances to the ledger value.')
+
+    def handle(self, *args, **options):
+        wallet_ids = list(Wallet.objects.order_by('pk').values_list('pk', flat=True))
+        size = options['chunk_size']
+        chunks = [wallet_ids[i:i + size] for i in range(0, len(wallet_ids), size)]
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            drift = [row for rows in pool.map(check_chunk, chunks) for row in rows]
+
+        owners = dict(Wallet.objects.filter(pk__in=[pk for pk, _, _ in drift]).values_list('pk', 'user_id'))
+        for pk, balance, ledger_balance in drift:
+            self.stdout.write(f'Wallet {pk}: balance {balance}, ledger {ledger_balance}')
+            if options['fix']:
+                # Only overwrite if nothing changed since the check
+                fixed = Wallet.objects.filter(pk=pk, balance=balance).update(
+                    balance=ledger_balance, version=F('version') + 1, modified=timezone.now(),
+                )
+                # The F() update does not send post_save
+                if fixed:
+                    user_cache.invalidate(owners[pk])
+
+        message = f'Checked {len(wallet_ids)} wallets in {len(chunks)} chunks, {len(drift)} drifted.'
+        if drift and not options['fix']:
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,86 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.report_jobs import (
+    REPORT_JOB_HEARTBEAT, claim_jobs, fail_job, purge_finished, release_jobs, requeue_stale, run_job,
+)
+
+
+class Command(BaseCommand):
+    help = 'Compute queued report jobs in a local process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                            help='Reports computed at the same time (default: one per CPU).')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds between checks for new jobs.')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty.')
+
+    def make_pool(self, processes):
+        # Spawned children import Django from scratch instead of sharing the
+        # parent's database connection; django.setup runs before any job
+        return ProcessPoolExecutor(
+            max_workers=processes, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup,
+        )
+
+    def handle(self, *args, **options):
+        processes = max(1, options['processes'])
+        poll = options['poll']
+
+        requeued = requeue_stale()
+        purged = purge_finished()
+        if requeued or purged:
+            self.stdout.write(f'Requeued {requeued} stale jobs, purged {purged} finished jobs.')
+
+        pool = self.make_pool(processes)
+        running = {}
+        processed = 0
+        next_requeue = time.monotonic() + REPORT_JOB_HEARTBEAT.total_seconds()
+        try:
+            while True:
+                if time.monotonic() >= next_requeue:
+                    # Jobs of another worker that died while this one keeps running
+                    requeued = requeue_stale()
+                    if requeued:
+                        self.stdout.write(f'Requeued {requeued} stale jobs.')
+                    next_requeue = time.monotonic() + REPORT_JOB_HEARTBEAT.total_seconds()
+                for job_id in claim_jobs(processes - len(running)):
+                    running[pool.submit(run_job, job_id)] = job_id
+                if not running:
+                    if options['once']:
+                        break
+                    # Nothing to watch, so hand the connection back while idle
+                    connections.close_all()
+                    time.sleep(poll)
+                    continue
+
+                done, _ = wait(running, timeout=poll, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    job_id = running.pop(future)
+                    processed += 1
+                    try:
+                        outcome = future.result()
+                    except Exception as e:
+                        fail_job(job_id, f'Worker error: {e!r}')
+                        outcome = 'failed'
+                        broken = broken or isinstance(e, BrokenProcessPool)
+                    self.stdout.write(f'Report job {job_id}: {outcome}')
+                if broken:
+                    # A child died (e.g. killed for memory) and took the pool down with it
+                    pool.shutdown(wait=False)
+                    pool = self.make_pool(processes)
+        except KeyboardInterrupt:
+            # Claimed jobs the pool has not started go back to the queue; interrupted
+            # ones stop beating and are requeued once REPORT_JOB_TIMEOUT passes
+            release_jobs([job_id for future, job_id in running.items() if future.cancel()])
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} report jobs.'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.models import CustomUser
+from api.payroll import PayrollConflict, run_payroll
+
+
+class Command(BaseCommand):
+    help = 'Credit UserProfile salaries for a pay period. Safe to re-run: paid wallets are skipped.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', help='Pay period as YYYY-MM (default: the current month).')
+        parser.add_argument('--user', action='append', dest='users', help='Only pay this username (repeatable).')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Profiles paid per transaction.')
+
+    def handle(self, *args, **options):
+        period = options['period'] or timezone.localdate().strftime('%Y-%m')
+
+        user_ids = None
+        if options['users']:
+            users = dict(CustomUser.objects.filter(username__in=options['users']).values_list('username', 'pk'))
+            missing = sorted(set(options['users']) - set(users))
+            if missing:
+                raise CommandError(f"Unknown users: {', '.join(missing)}.")
+            user_ids = list(users.values())
+
+        try:
+            result = run_payroll(period, user_ids=user_ids, chunk_size=options['chunk_size'])
+        except (ValueError, PayrollConflict) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Payroll {result['period']}: paid {result['paid']} profiles ({result['amount']}), "
+            f"{result['already_paid']} already paid."
+        ))
@@ -0,0 +1,37 @@
+# Generated by Django 5.0 on 2026-10-17 20:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from api.rollups import write_rollups
+
+
+def backfill_rollups(apps, schema_editor):
+    write_rollups((apps.get_model('api', 'Transaction'),), apps.get_model('api', 'TransactionRollup'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('transaction_type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], max_length=7)),
+                ('category', models.CharField(choices=[('food', 'Food'), ('transport', 'Transport'), ('entertainment', 'Entertainment'), ('other', 'Other')], max_length=20)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='api.wallet')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='transactionrollup',
+            constraint=models.UniqueConstraint(fields=('wallet', 'day', 'transaction_type', 'category'), name='unique_transaction_rollup'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0 on 2026-10-17 20:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_transactionrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', 'date'], name='transaction_wallet_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', 'transaction_type', 'date'], name='transaction_wallet_type_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0 on 2026-10-17 20:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_balancecheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(max_length=7, unique=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PayrollPayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payroll_payments', to='api.wallet')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='api.payrollrun')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='payrollpayment',
+            constraint=models.UniqueConstraint(fields=('run', 'wallet'), name='unique_payroll_payment'),
+        ),
+    ]
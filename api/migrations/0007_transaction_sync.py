@@ -0,0 +1,47 @@
+# Generated by Django 5.0 on 2026-10-17 20:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_updated_at(apps, schema_editor):
+    Transaction = apps.get_model('api', 'Transaction')
+    Transaction.objects.update(updated_at=models.F('date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', 'updated_at', 'id'], name='transaction_wallet_sync_idx'),
+        ),
+        migrations.AddField(
+            model_name='transactiontombstone',
+            name='wallet',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tombstones', to='api.wallet'),
+        ),
+        migrations.AddIndex(
+            model_name='transactiontombstone',
+            index=models.Index(fields=['wallet', 'deleted_at', 'id'], name='tombstone_wallet_sync_idx'),
+        ),
+    ]
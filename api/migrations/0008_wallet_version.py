@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-17 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_transaction_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='modified',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0 on 2026-10-17 20:57
+
+import api.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_wallet_version'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='customuser',
+            managers=[
+                ('objects', api.models.CustomUserManager()),
+            ],
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0 on 2026-10-17 21:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_reportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cutoff', models.DateTimeField(db_index=True)),
+                ('moved', models.PositiveIntegerField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TransactionArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('transaction_type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], max_length=7)),
+                ('category', models.CharField(choices=[('food', 'Food'), ('transport', 'Transport'), ('entertainment', 'Entertainment'), ('other', 'Other')], default='other', max_length=20)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('date', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_transactions', to='api.wallet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['wallet', 'date'], name='archive_wallet_date_idx')],
+            },
+        ),
+    ]
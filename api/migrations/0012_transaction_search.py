@@ -0,0 +1,67 @@
+from django.db import migrations
+
+from api.search import FTS_TABLE, POSTGRESQL_VECTOR, SEARCH_CONFIG
+
+TABLES = ('api_transaction', 'api_transactionarchive')
+
+
+def sqlite_forward(table):
+    return [
+        f"""CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, wallet, description)
+            VALUES (new.id, 'w' || new.wallet_id, coalesce(new.description, ''));
+        END""",
+        f"""CREATE TRIGGER {table}_fts_update AFTER UPDATE OF wallet_id, description ON {table} BEGIN
+            UPDATE {FTS_TABLE} SET wallet = 'w' || new.wallet_id, description = coalesce(new.description, '')
+            WHERE rowid = old.id;
+        END""",
+        f"""CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        END""",
+        f"""INSERT INTO {FTS_TABLE}(rowid, wallet, description)
+            SELECT id, 'w' || wallet_id, coalesce(description, '') FROM {table}""",
+    ]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        statements = [f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(wallet, description)"]
+        for table in TABLES:
+            statements += sqlite_forward(table)
+    elif vendor == 'postgresql':
+        statements = [
+            f"CREATE INDEX {table}_fts_idx ON {table} "
+            f"USING gin ({POSTGRESQL_VECTOR.format(config=SEARCH_CONFIG, column='description')})"
+            for table in TABLES
+        ]
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        statements = [
+            f"DROP TRIGGER IF EXISTS {table}_fts_{event}"
+            for table in TABLES for event in ('insert', 'update', 'delete')
+        ] + [f"DROP TABLE IF EXISTS {FTS_TABLE}"]
+    elif vendor == 'postgresql':
+        statements = [f"DROP INDEX IF EXISTS {table}_fts_idx" for table in TABLES]
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_transaction_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-17 21:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_transaction_search'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='wallet',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,13 +1,32 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
+from rest_framework.utils.encoders import JSONEncoder
 from django.db import models
-from django.db.models.signals import post_save
+from django.db import transaction as db_transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.db.models import Sum
+from django.db.models import Sum, F
+from django.utils import timezone
 from datetime import datetime
+from .ledger import apply_delta, signed_amount
+from .cache import user_cache
+
+
+class CustomUserManager(UserManager):
+    """`create_user` and `create_superuser` also create the user's wallet and profile."""
+
+    def _create_user(self, username, email, password, **extra_fields):
+        from .users import provision_accounts
+
+        with db_transaction.atomic():
+            user = super()._create_user(username, email, password, **extra_fields)
+            provision_accounts([user])
+        return user
 
 
 # CustomUser Model
 class CustomUser(AbstractUser):
+    objects = CustomUserManager()
+
     def __str__(self):
         return self.username
 
@@ -19,47 +38,26 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"Profile of {self.user.username}"
 
-    def save(self, *args, **kwargs):
-        is_new_salary = False
-        if self.pk:  # Check if the object already exists
-            old_instance = UserProfile.objects.filter(pk=self.pk).first()
-            if old_instance and old_instance.salary != self.salary:
-                is_new_salary = True
-        else:
-            is_new_salary = True  # Treat as new for objects being created
-
-        # Only update the wallet and create a transaction if the salary is new or updated
-        if is_new_salary and self.salary > 0:
-            if hasattr(self.user, 'wallet'):  # Ensure the user has a wallet
-                # Create a transaction for the new salary
-                transaction = Transaction.objects.create(
-                    wallet=self.user.wallet,
-                    amount=self.salary,
-                    transaction_type='income',
-                    category='other',
-                    description=f"Salary for {self.user.username}",
-                )
-
-                # Now update the wallet balance after the transaction is created
-                self.user.wallet.update_balance(self.salary)  # This will add salary to the wallet balance
-
-        super().save(*args, **kwargs)
-
-
-
 
 # Wallet Model
 class Wallet(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='wallet')
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Change markers for conditional GETs of the owner's data (see api/conditional.py)
+    version = models.PositiveBigIntegerField(default=0, editable=False)
+    modified = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Wallet of {self.user.username}"
 
-    def update_balance(self, amount):
+    def update_balance(self, amount, check_balance=False):
         """Update the wallet balance by the given amount."""
-        self.balance += amount
-        self.save()
+        apply_delta(self, amount, check_balance=check_balance)
+
+    @classmethod
+    def touch(cls, **lookup):
+        """Mark the matching wallets' data as changed, in one UPDATE."""
+        return cls.objects.filter(**lookup).update(version=F('version') + 1, modified=timezone.now())
 
 
 # Transaction Model
@@ -82,31 +80,317 @@ class Transaction(models.Model):
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default='other')
     description = models.TextField(blank=True, null=True)
     date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['wallet', 'date'], name='transaction_wallet_date_idx'),
+            models.Index(fields=['wallet', 'transaction_type', 'date'], name='transaction_wallet_type_idx'),
+            models.Index(fields=['wallet', 'updated_at', 'id'], name='transaction_wallet_sync_idx'),
+        ]
 
     def __str__(self):
         return f"{self.transaction_type.capitalize()} - {self.amount} - {self.wallet.user.username}"
 
-    def save(self, *args, **kwargs):
-        """Update wallet balance when a transaction is created."""
-        if self.pk is None:  # Only update balance for new transactions
-            if self.transaction_type == 'expense':
-                self.wallet.update_balance(-self.amount)
-            elif self.transaction_type == 'income':
-                self.wallet.update_balance(self.amount)
-        super().save(*args, **kwargs)
+    ROLLUP_FIELDS = ('wallet_id', 'date', 'transaction_type', 'category', 'amount')
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so rollups can subtract them on update;
+        # the key itself is only built when the row is saved or deleted
+        if len(values) == len(cls._meta.concrete_fields):
+            instance._loaded_rollup_values = tuple(getattr(instance, name) for name in cls.ROLLUP_FIELDS)
+        return instance
 
-# Signals to create Wallet and Profile when CustomUser is created
-@receiver(post_save, sender=CustomUser)
-def create_wallet_and_profile(sender, instance, created, **kwargs):
-    if created:
-        Wallet.objects.create(user=instance)
-        UserProfile.objects.create(user=instance)
+    @staticmethod
+    def make_rollup_key(wallet_id, date, transaction_type, category, amount):
+        """Return the (wallet_id, day, type, category, amount) a row with these values contributes to rollups."""
+        if date is None:
+            return None
+        day = timezone.localtime(date, timezone.get_default_timezone()).date()
+        return (wallet_id, day, transaction_type, category, amount)
+
+    def rollup_key(self):
+        """Return the rollup key of the current field values."""
+        return self.make_rollup_key(*(getattr(self, name) for name in self.ROLLUP_FIELDS))
+
+    def loaded_rollup_key(self):
+        """Return the rollup key of the values loaded from the database, if they were all loaded."""
+        values = getattr(self, '_loaded_rollup_values', None)
+        return None if values is None else self.make_rollup_key(*values)
+
+    def save(self, *args, check_balance=False, **kwargs):
+        """Update wallet balance when a transaction is created.
+
+        The balance change and the insert happen in one atomic block, so the
+        delta is applied exactly once. With `check_balance` an expense that
+        the wallet cannot cover raises InsufficientBalance.
+        """
+        if self.pk is not None:  # Only update balance for new transactions
+            if not self._state.adding and not hasattr(self, '_loaded_rollup_values'):
+                # Loaded with deferred fields: read the stored values the rollup receiver subtracts
+                self._loaded_rollup_values = Transaction.objects.filter(pk=self.pk).values_list(
+                    *self.ROLLUP_FIELDS).first()
+            return super().save(*args, **kwargs)
+        with db_transaction.atomic():
+            delta = signed_amount(self.transaction_type, self.amount)
+            self.wallet.update_balance(delta, check_balance=check_balance)
+            super().save(*args, **kwargs)
+
+
+# Transactions moved out of the hot table by api.archive; same columns, order and ids
+class TransactionArchive(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='archived_transactions')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    transaction_type = models.CharField(max_length=7, choices=Transaction.TRANSACTION_TYPES)
+    category = models.CharField(max_length=20, choices=Transaction.CATEGORY_CHOICES, default='other')
+    description = models.TextField(blank=True, null=True)
+    date = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['wallet', 'date'], name='archive_wallet_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction_type.capitalize()} - {self.amount} - {self.date:%Y-%m-%d} (archived)"
+
+
+# Reads look in the archive for dates before the latest `cutoff`
+class ArchiveRun(models.Model):
+    cutoff = models.DateTimeField(db_index=True)
+    moved = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archive before {self.cutoff:%Y-%m-%d} ({self.moved} moved)"
+
+
+# Pre-aggregated per-wallet, per-day totals used by the reports
+class TransactionRollup(models.Model):
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='rollups')
+    day = models.DateField()
+    transaction_type = models.CharField(max_length=7, choices=Transaction.TRANSACTION_TYPES)
+    category = models.CharField(max_length=20, choices=Transaction.CATEGORY_CHOICES)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['wallet', 'day', 'transaction_type', 'category'],
+                name='unique_transaction_rollup',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} - {self.transaction_type} - {self.category} - {self.total}"
+
+    @classmethod
+    def apply(cls, key, sign):
+        """Add (sign=1) or remove (sign=-1) one transaction from its rollup bucket."""
+        wallet_id, day, transaction_type, category, amount = key
+        bucket = cls.objects.filter(
+            wallet_id=wallet_id, day=day, transaction_type=transaction_type, category=category,
+        )
+        if sign > 0:
+            cls.objects.get_or_create(
+                wallet_id=wallet_id, day=day, transaction_type=transaction_type, category=category,
+            )
+        bucket.update(total=F('total') + sign * amount, count=F('count') + sign)
+        if sign < 0:
+            bucket.filter(count=0).delete()
+
+
+@receiver(post_save, sender=Transaction)
+def update_rollup_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new_values = tuple(getattr(instance, name) for name in Transaction.ROLLUP_FIELDS)
+    old_values = None if created else getattr(instance, '_loaded_rollup_values', None)
+    if old_values == new_values:
+        return
+    old_key = None if old_values is None else Transaction.make_rollup_key(*old_values)
+    new_key = Transaction.make_rollup_key(*new_values)
+    if old_key != new_key:
+        if old_key is not None:
+            TransactionRollup.apply(old_key, -1)
+        if new_key is not None:
+            TransactionRollup.apply(new_key, 1)
+    instance._loaded_rollup_values = new_values
+
+
+@receiver(post_delete, sender=Transaction)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    key = instance.loaded_rollup_key() or instance.rollup_key()
+    if key is not None:
+        TransactionRollup.apply(key, -1)
+
+
+# Ledger balance of a wallet at a point in time: all transactions with date < as_of
+class BalanceCheckpoint(models.Model):
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='checkpoints')
+    as_of = models.DateTimeField()
+    balance = models.DecimalField(max_digits=14, decimal_places=2)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['wallet', 'as_of'], name='unique_balance_checkpoint'),
+        ]
+
+    def __str__(self):
+        return f"{self.wallet} - {self.as_of} - {self.balance}"
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def drop_stale_checkpoints(sender, instance, created=False, raw=False, **kwargs):
+    """Editing or deleting a transaction invalidates the checkpoints that include it."""
+    if raw or created or instance.date is None:
+        return
+    BalanceCheckpoint.objects.filter(wallet_id=instance.wallet_id, as_of__gt=instance.date).delete()
+
+
+# Deleted transaction ids, so sync clients can drop their local copies
+class TransactionTombstone(models.Model):
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='tombstones')
+    transaction_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['wallet', 'deleted_at', 'id'], name='tombstone_wallet_sync_idx'),
+        ]
+
+    def __str__(self):
+        return f"Deleted transaction {self.transaction_id}"
+
+
+@receiver(post_delete, sender=Transaction)
+def create_tombstone(sender, instance, origin=None, **kwargs):
+    # Not for cascades from a wallet or user delete: the tombstones would go with the wallet
+    origin_model = getattr(origin, 'model', type(origin))  # a queryset or an instance
+    if origin is None or origin_model is Transaction:
+        TransactionTombstone.objects.create(wallet_id=instance.wallet_id, transaction_id=instance.pk)
+
+
+# One row per pay period; its payments make a payroll run safe to retry
+class PayrollRun(models.Model):
+    period = models.CharField(max_length=7, unique=True)  # YYYY-MM
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Payroll {self.period}"
+
+
+class PayrollPayment(models.Model):
+    run = models.ForeignKey(PayrollRun, on_delete=models.CASCADE, related_name='payments')
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='payroll_payments')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['run', 'wallet'], name='unique_payroll_payment'),
+        ]
+
+    def __str__(self):
+        return f"{self.run} - {self.wallet} - {self.amount}"
+
+
+# Response of a create request, replayed when a client retries with the same Idempotency-Key
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)  # sha256 of method, full path and parsed body
+    status_code = models.PositiveSmallIntegerField()
+    body = models.JSONField(encoder=JSONEncoder)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.key}"
+
+
+# A report computed by the report_worker command instead of the web worker
+class ReportJob(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='report_jobs')
+    params = models.JSONField(default=dict)  # ReportView query parameters
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default='pending')
+    result = models.JSONField(null=True, blank=True, encoder=JSONEncoder)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created'], name='reportjob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Report job {self.pk} ({self.status})"
+
+
+# Drop the cached reports, balances and profiles of the affected user
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def invalidate_transaction_cache(sender, instance, **kwargs):
+    if Transaction.wallet.is_cached(instance):
+        user_id = instance.wallet.user_id
+    else:
+        user_id = Wallet.objects.filter(pk=instance.wallet_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        db_transaction.on_commit(lambda: user_cache.invalidate(user_id))
+
+
+@receiver(post_save, sender=Wallet)
+@receiver(post_delete, sender=Wallet)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_user_cache(sender, instance, **kwargs):
+    db_transaction.on_commit(lambda: user_cache.invalidate(instance.user_id))
+
+
+# Bump the version the ETag/Last-Modified validators are built from;
+# a new transaction's balance UPDATE (apply_delta) already bumped it
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def touch_wallet_on_transaction_change(sender, instance, created=False, raw=False, **kwargs):
+    if not raw and not created:
+        Wallet.touch(pk=instance.wallet_id)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def touch_wallet_on_profile_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        Wallet.touch(user_id=instance.user_id)
+
+
+# The report's user_info is built from these fields
+USER_INFO_FIELDS = {'username', 'email', 'first_name', 'last_name'}
 
 
 @receiver(post_save, sender=CustomUser)
-def save_wallet_and_profile(sender, instance, **kwargs):
-    if hasattr(instance, 'wallet'):
-        instance.wallet.save()
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
+def touch_wallet_on_user_change(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or created or (update_fields is not None and not USER_INFO_FIELDS.intersection(update_fields)):
+        return  # e.g. the last_login update of every login
+    Wallet.touch(user_id=instance.pk)
+    db_transaction.on_commit(lambda: user_cache.invalidate(instance.pk))
@@ -0,0 +1,96 @@
+import re
+
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from .cache import user_cache
+from .models import PayrollPayment, PayrollRun, Transaction, UserProfile, Wallet
+from .rollups import add_to_rollups
+
+PERIOD_RE = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+
+
+class PayrollConflict(Exception):
+    """Raised when a concurrent run paid some wallets of a chunk first."""
+
+
+def validate_period(period):
+    """Return the pay period if it is a YYYY-MM string, else raise ValueError."""
+    if not isinstance(period, str) or not PERIOD_RE.match(period):
+        raise ValueError("Pay period must be in YYYY-MM format.")
+    return period
+
+
+def run_payroll(period, user_ids=None, chunk_size=1000):
+    """Credit the salary of every profile (or of `user_ids`) once for `period`.
+
+    Each chunk is one atomic block: the payment records, a `bulk_create` of
+    the income transactions, the rollups, and a single UPDATE of all the
+    chunk's wallet balances. Wallets that already have a payment for the
+    period are skipped, so an interrupted or repeated run only pays the
+    rest. A chunk that a concurrent run paid first is rolled back and
+    raises PayrollConflict. Returns a summary dict.
+    """
+    validate_period(period)
+    run, _ = PayrollRun.objects.get_or_create(period=period)
+
+    profiles = UserProfile.objects.filter(salary__gt=0, user__wallet__isnull=False)
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=user_ids)
+    already_paid = profiles.filter(user__wallet__payroll_payments__run=run).count()
+    rows = list(
+        profiles.exclude(user__wallet__payroll_payments__run=run)
+        .order_by('pk')
+        .values_list('user__wallet__id', 'user_id', 'user__username', 'salary')
+    )
+
+    for start in range(0, len(rows), chunk_size):
+        pay_chunk(run, rows[start:start + chunk_size])
+
+    totals = run.payments.aggregate(total=Sum('amount'))
+    return {
+        'period': period,
+        'paid': len(rows),
+        'already_paid': already_paid,
+        'amount': sum(salary for _, _, _, salary in rows),
+        'period_total': totals['total'] or 0,
+    }
+
+
+def pay_chunk(run, rows):
+    wallet_ids = [wallet_id for wallet_id, _, _, _ in rows]
+    with db_transaction.atomic():
+        # The unique (run, wallet) constraint stops a concurrent run from paying twice
+        try:
+            PayrollPayment.objects.bulk_create([
+                PayrollPayment(run=run, wallet_id=wallet_id, amount=salary)
+                for wallet_id, _, _, salary in rows
+            ])
+        except IntegrityError:
+            raise PayrollConflict(
+                f"Another payroll run for {run.period} is paying the same wallets; retry to pay the rest."
+            )
+        created = Transaction.objects.bulk_create([
+            Transaction(
+                wallet_id=wallet_id,
+                amount=salary,
+                transaction_type='income',
+                category='other',
+                description=f"Salary for {username} ({run.period})",
+            )
+            for wallet_id, _, username, salary in rows
+        ])
+        add_to_rollups(created)
+        amount = PayrollPayment.objects.filter(run=run, wallet=OuterRef('pk')).values('amount')
+        Wallet.objects.filter(pk__in=wallet_ids).update(
+            balance=F('balance') + Subquery(amount), version=F('version') + 1, modified=timezone.now(),
+        )
+
+        # bulk_create and the F() balance update do not send post_save
+        db_transaction.on_commit(lambda: invalidate_users(user_id for _, user_id, _, _ in rows))
+
+
+def invalidate_users(user_ids):
+    for user_id in user_ids:
+        user_cache.invalidate(user_id)
@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.db import connections
+
+PROFILING_HEADERS = getattr(settings, 'PROFILING_HEADERS', settings.DEBUG)
+PROFILING_SAMPLES = getattr(settings, 'PROFILING_SAMPLES', 1000)
+
+_current = ContextVar('api_profile', default=None)
+
+
+class RouteStats:
+    """Rolling per-route samples used for the staff stats endpoint."""
+
+    def __init__(self, samples=PROFILING_SAMPLES):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=samples))
+        self._requests = defaultdict(int)
+
+    def record(self, route, profile):
+        with self._lock:
+            self._requests[route] += 1
+            self._samples[route].append(profile)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._requests.clear()
+
+    def summary(self):
+        with self._lock:
+            samples = {route: list(values) for route, values in self._samples.items()}
+            requests = dict(self._requests)
+        return {
+            route: {
+                'requests': requests[route],
+                'time_ms': percentiles([p['time'] * 1000 for p in values]),
+                'db_time_ms': percentiles([p['db_time'] * 1000 for p in values]),
+                'queries': percentiles([p['queries'] for p in values]),
+                'serializer_time_ms': percentiles([p['serializer_time'] * 1000 for p in values]),
+                'response_size': percentiles([p['response_size'] for p in values]),
+            }
+            for route, values in sorted(samples.items())
+        }
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def pick(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))], 3)
+
+    return {'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99), 'max': round(values[-1], 3)}
+
+
+route_stats = RouteStats()
+
+
+@contextmanager
+def profile_section(name):
+    """Add the time spent in the block to `<name>_time` of the current request.
+
+    Nested sections with the same name are only counted once.
+    """
+    profile = _current.get()
+    key = f'{name}_time'
+    if profile is None or profile['_active'].get(name):
+        yield
+        return
+    profile['_active'][name] = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile[key] = profile.get(key, 0) + time.perf_counter() - start
+        profile['_active'][name] = False
+
+
+class ProfiledSerializerMixin:
+    """Count the serializer's `to_representation` towards the request's serializer time."""
+
+    def to_representation(self, instance):
+        with profile_section('serializer'):
+            return super().to_representation(instance)
+
+
+def count_query(execute, sql, params, many, context):
+    """Execute wrapper adding the query to the current request's profile, if any.
+
+    The profile is found through a context variable, so queries run by the
+    async ORM in a worker thread are counted as well.
+    """
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile['queries'] += 1
+        profile['db_time'] += time.perf_counter() - start
+
+
+@contextmanager
+def count_queries():
+    """Wrap the current thread's connections with `count_query` for the block."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(count_query))
+        yield
+
+
+class QueryProfilingMiddleware:
+    """Record query count, DB time, serializer time and response size per request.
+
+    The numbers go to `route_stats` and, when PROFILING_HEADERS is on
+    (default: DEBUG), to X-Profile-* response headers. Works for both sync
+    and async views, so it does not force async views onto a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile, token = self.start()
+        try:
+            with count_queries():
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        profile, token = self.start()
+        # The async ORM queries on the thread-sensitive executor, so the
+        # wrappers go on that thread's connections
+        counter = count_queries()
+        await sync_to_async(counter.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(counter.__exit__)(None, None, None)
+            _current.reset(token)
+        return self.finish(request, response, profile)
+
+    def start(self):
+        profile = {'queries': 0, 'db_time': 0, 'serializer_time': 0, '_active': {}, '_start': time.perf_counter()}
+        return profile, _current.set(profile)
+
+    def finish(self, request, response, profile):
+        profile['time'] = time.perf_counter() - profile['_start']
+        profile['response_size'] = 0 if response.streaming else len(response.content)
+
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            route_stats.record(f'{request.method} /{match.route}', profile)
+
+        if PROFILING_HEADERS:
+            response['X-Profile-Queries'] = profile['queries']
+            response['X-Profile-DB-Time'] = f"{profile['db_time'] * 1000:.2f}ms"
+            response['X-Profile-Serializer-Time'] = f"{profile['serializer_time'] * 1000:.2f}ms"
+            response['X-Profile-Time'] = f"{profile['time'] * 1000:.2f}ms"
+            response['X-Profile-Response-Size'] = profile['response_size']
+        return response
@@ -0,0 +1,113 @@
+"""Reports computed outside the web workers.
+
+A job row stores the ReportView parameters. `manage.py report_worker`
+claims pending rows with a conditional UPDATE, so several workers can share
+the table without an external broker, and runs each one in a process pool.
+The result is built by `reports.build_full_report`: the payload ReportView
+returns, with every transaction instead of a page.
+"""
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .models import ReportJob
+from .reports import build_full_report
+
+REPORT_JOB_TIMEOUT = getattr(settings, 'REPORT_JOB_TIMEOUT', timedelta(minutes=5))
+REPORT_JOB_HEARTBEAT = getattr(settings, 'REPORT_JOB_HEARTBEAT', timedelta(minutes=1))
+REPORT_JOB_RETENTION = getattr(settings, 'REPORT_JOB_RETENTION', timedelta(days=7))
+REPORT_JOB_MAX_PENDING = getattr(settings, 'REPORT_JOB_MAX_PENDING', 5)
+REPORT_PARAMS = ('day', 'month', 'year')
+
+
+@contextmanager
+def heartbeat(job_id, interval=None):
+    """Bump the running job's `started` every `interval` while the block runs.
+
+    `requeue_stale` only takes back jobs whose `started` is older than
+    REPORT_JOB_TIMEOUT, so a long report that is still being computed is
+    never handed to a second worker. The beats come from a thread with its
+    own database connection.
+    """
+    interval = (interval or REPORT_JOB_HEARTBEAT).total_seconds()
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(interval):
+                ReportJob.objects.filter(pk=job_id, status='running').update(started=timezone.now())
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'report-job-{job_id}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_job(job_id):
+    """Compute one claimed job and record the outcome; returns the final status.
+
+    Runs in a pool process, which keeps its own database connection.
+    """
+    close_old_connections()
+    job = ReportJob.objects.select_related('user').get(pk=job_id)
+    try:
+        with heartbeat(job_id):
+            result = build_full_report(job.user, job.params)
+    except Exception as e:
+        fail_job(job_id, str(e) or type(e).__name__)
+        return 'failed'
+    job.result = result
+    job.status = 'done'
+    job.finished = timezone.now()
+    job.save(update_fields=['result', 'status', 'finished'])
+    return 'done'
+
+
+def claim_jobs(limit):
+    """Mark up to `limit` pending jobs as running and return their ids, oldest first.
+
+    A job is only claimed when the UPDATE still finds it pending, so two
+    workers never run the same job.
+    """
+    claimed = []
+    if limit <= 0:
+        return claimed
+    candidates = ReportJob.objects.filter(status='pending').order_by('created').values_list('pk', flat=True)
+    for pk in candidates[:limit]:
+        if ReportJob.objects.filter(pk=pk, status='pending').update(status='running', started=timezone.now()):
+            claimed.append(pk)
+    return claimed
+
+
+def fail_job(job_id, error):
+    ReportJob.objects.filter(pk=job_id).update(status='failed', error=error, finished=timezone.now())
+
+
+def release_jobs(job_ids):
+    """Return claimed jobs that were never started to the queue."""
+    return ReportJob.objects.filter(pk__in=job_ids, status='running').update(status='pending', started=None)
+
+
+def requeue_stale():
+    """Put back jobs left running by a worker that died; returns how many.
+
+    A live job's heartbeat keeps its `started` recent, so only jobs without
+    a beat for REPORT_JOB_TIMEOUT are taken back.
+    """
+    cutoff = timezone.now() - REPORT_JOB_TIMEOUT
+    return ReportJob.objects.filter(status='running', started__lt=cutoff).update(status='pending', started=None)
+
+
+def purge_finished():
+    """Delete finished jobs older than REPORT_JOB_RETENTION; returns how many."""
+    cutoff = timezone.now() - REPORT_JOB_RETENTION
+    return ReportJob.objects.filter(status__in=['done', 'failed'], finished__lt=cutoff).delete()[0]
@@ -0,0 +1,185 @@
+from django.db.models import Q, Sum, Count
+from rest_framework.exceptions import ValidationError
+
+from .archive import DEFAULT_ORDERING, get_archive_cutoff
+from .dates import get_datetime_range
+from .fast_serializers import get_row_encoder
+from .filters import TransactionFilter
+from .models import Transaction, TransactionArchive, Wallet
+from .rollups import get_rollups
+from .serialaizer import TransactionSerializer
+
+
+def _grouped_transactions(queryset):
+    return (
+        queryset.order_by()
+        .values('transaction_type', 'category')
+        .annotate(total=Sum('amount'), count=Count('id'))
+    )
+
+
+def _grouped_rollups(rollups):
+    return (
+        rollups.order_by()
+        .values('transaction_type', 'category')
+        .annotate(total=Sum('total'), count=Sum('count'))
+    )
+
+
+def summarize_transactions(queryset):
+    """Compute the report totals for the queryset in a single grouped query.
+
+    Returns a dict with income/expense sums, per-type counts, per-category
+    counts and the total number of transactions. A queryset combined with
+    the archive is summarized part by part.
+    """
+    parts = getattr(queryset, 'parts', (queryset,))
+    return _summarize_rows(row for part in parts for row in _grouped_transactions(part))
+
+
+def summarize_rollups(rollups):
+    """Same as `summarize_transactions`, but read from daily rollup rows."""
+    return _summarize_rows(_grouped_rollups(rollups))
+
+
+async def asummarize_transactions(queryset):
+    """Async variant of `summarize_transactions`."""
+    return _summarize_rows([row async for row in _grouped_transactions(queryset)])
+
+
+async def asummarize_rollups(rollups):
+    """Async variant of `summarize_rollups`."""
+    return _summarize_rows([row async for row in _grouped_rollups(rollups)])
+
+
+def _summarize_rows(rows):
+    totals = {'income': None, 'expense': None}
+    type_counts = {'income': 0, 'expense': 0}
+    category_counts = {}
+
+    for row in rows:
+        transaction_type = row['transaction_type']
+        if transaction_type in totals:
+            totals[transaction_type] = (totals[transaction_type] or 0) + row['total']
+            type_counts[transaction_type] += row['count']
+        category_counts[row['category']] = category_counts.get(row['category'], 0) + row['count']
+
+    return {
+        'total_income': totals['income'],
+        'total_expense': totals['expense'],
+        'income_count': type_counts['income'],
+        'expense_count': type_counts['expense'],
+        'total_transactions': sum(category_counts.values()),
+        'transaction_categories': [
+            {'category': category, 'count': count}
+            for category, count in sorted(category_counts.items())
+        ],
+    }
+
+
+def get_last_transaction(queryset):
+    """Return the most recent transaction in the queryset, or None."""
+    return queryset.order_by('-date', '-id').first()
+
+
+async def aget_last_transaction(queryset):
+    """Async variant of `get_last_transaction`."""
+    return await queryset.order_by('-date', '-id').afirst()
+
+
+def validate_and_adjust_dates(day, month, year):
+    """Validate and adjust the dates if day is provided but month/year is missing."""
+
+    # Вақте ки танҳо рӯз ворид мешавад ва моҳ нест
+    if day and not month:
+        raise ValidationError("Month is required when day is provided.")
+
+    # Вақте ки рӯз ва моҳ ворид мешаванд, вале сол нест
+    if day and month and not year:
+        raise ValidationError("Year is required when both day and month are provided.")
+
+    # Вақте ки моҳ ворид мешавад, солро низ талаб мекунем
+    if month and not year:
+        raise ValidationError("Year is required when month is provided.")
+
+    # Вақте ки сол ворид шудааст: диапазони [start, end)
+    if year:
+        try:
+            start, end = get_datetime_range(year, month, day)
+        except ValueError as e:
+            raise ValidationError(str(e))
+        return Q(date__gte=start, date__lt=end)
+
+    return Q()  # Агар ҳеҷ як филтри таърихро ворид накарданд
+
+
+def build_report(user, wallet, queryset, day=None, month=None, year=None, use_rollups=True, paginate=None):
+    """Return the report payload for the wallet's already filtered `queryset`.
+
+    The totals come from the rollups of the day/month/year range, or from
+    the rows themselves without `use_rollups`. `paginate(queryset, summary)`
+    returns the transaction details and pagination info of the requested
+    page; without it every transaction is inlined.
+    """
+    # Totals, counts and categories in one grouped query
+    if use_rollups:
+        summary = summarize_rollups(get_rollups(wallet, day, month, year))
+    else:
+        summary = summarize_transactions(queryset)
+    last_transaction = get_last_transaction(queryset)
+
+    if paginate is None:
+        encoder = get_row_encoder(TransactionSerializer)
+        transaction_details = encoder.encode_many(queryset.values(*encoder.sources))
+        paginator_info = {}
+    else:
+        transaction_details, paginator_info = paginate(queryset, summary)
+
+    result = {
+        'income': summary['total_income'] or 0,
+        'expense': summary['total_expense'] or 0,
+        'balance': wallet.balance,
+        'income_count': summary['income_count'],
+        'expense_count': summary['expense_count'],
+        'total_transactions': summary['total_transactions'],
+        'date_range_summary': {
+            'total_income': summary['total_income'],
+            'total_expense': summary['total_expense'],
+        },
+        'user_info': {
+            'username': user.username,
+            'email': user.email,
+            'full_name': user.get_full_name()
+        },
+        'last_transaction': TransactionSerializer(last_transaction).data if last_transaction else None,
+        'transaction_categories': summary['transaction_categories'],
+        'transaction_details': transaction_details
+    }
+
+    # Include pagination info if the queryset is paginated
+    if paginator_info:
+        result.update(paginator_info)
+    return result
+
+
+def build_full_report(user, params):
+    """The report for the day/month/year in `params` with every matching transaction inlined.
+
+    Archived transactions are included when the dates reach them. Raises
+    ValueError when the dates are invalid or the user has no wallet.
+    """
+    day, month, year = params.get('day'), params.get('month'), params.get('year')
+    try:
+        validate_and_adjust_dates(day, month, year)
+    except ValidationError as e:
+        raise ValueError(e.detail[0])
+
+    wallet = Wallet.objects.filter(user=user).first()
+    if not wallet:
+        raise ValueError("Wallet not found.")
+
+    filterset = TransactionFilter(params, queryset=Transaction.objects.filter(wallet=wallet).order_by(*DEFAULT_ORDERING))
+    if not filterset.is_valid():
+        raise ValueError(f"Invalid report parameters: {dict(filterset.errors)}")
+    queryset = filterset.with_archive(TransactionArchive.objects.filter(wallet=wallet), get_archive_cutoff())
+    return build_report(user, wallet, queryset, day, month, year)
@@ -0,0 +1,90 @@
+from django.db import transaction as db_transaction
+from django.db.models import Sum, Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .dates import get_date_bounds
+from .models import Transaction, TransactionArchive, TransactionRollup
+
+
+def rebuild_rollups(wallet_ids=None):
+    """Recompute the daily rollups from the raw transactions, archived ones included.
+
+    Rebuilds every wallet unless `wallet_ids` is given. Returns the number
+    of rollup rows written.
+    """
+    return write_rollups((Transaction, TransactionArchive), TransactionRollup, wallet_ids)
+
+
+def write_rollups(transaction_models, rollup_model, wallet_ids=None):
+    """Replace the rollups of `rollup_model` with totals of the `transaction_models` rows.
+
+    Takes the models as arguments so migrations can pass their historical
+    versions. Returns the number of rollup rows written.
+    """
+    rollups = rollup_model.objects.all()
+    if wallet_ids is not None:
+        rollups = rollups.filter(wallet_id__in=wallet_ids)
+
+    # Archived transactions are part of the history the rollups describe;
+    # a day can have rows in both tables, so the buckets are merged here
+    buckets = {}
+    for model in transaction_models:
+        transactions = model.objects.all()
+        if wallet_ids is not None:
+            transactions = transactions.filter(wallet_id__in=wallet_ids)
+        rows = (
+            transactions.order_by()
+            .annotate(day=TruncDate('date', tzinfo=timezone.get_default_timezone()))
+            .values_list('wallet_id', 'day', 'transaction_type', 'category')
+            .annotate(total=Sum('amount'), count=Count('id'))
+        )
+        for wallet_id, day, transaction_type, category, total, count in rows.iterator():
+            key = (wallet_id, day, transaction_type, category)
+            bucket_total, bucket_count = buckets.get(key, (0, 0))
+            buckets[key] = (bucket_total + total, bucket_count + count)
+
+    with db_transaction.atomic():
+        rollups.delete()
+        created = rollup_model.objects.bulk_create(
+            (
+                rollup_model(
+                    wallet_id=wallet_id, day=day, transaction_type=transaction_type, category=category,
+                    total=total, count=count,
+                )
+                for (wallet_id, day, transaction_type, category), (total, count) in buckets.items()
+            ),
+            batch_size=1000,
+        )
+    return len(created)
+
+
+def get_rollups(wallet, day=None, month=None, year=None):
+    """Return the wallet's rollup rows restricted to the given day/month/year."""
+    rollups = TransactionRollup.objects.filter(wallet=wallet)
+    if year:
+        start, end = get_date_bounds(year, month, day)
+        rollups = rollups.filter(day__gte=start, day__lt=end)
+    return rollups
+
+
+def add_to_rollups(transactions):
+    """Add freshly inserted transactions to their rollup buckets.
+
+    Used after `bulk_create`, which does not send `post_save`. Rows are
+    grouped per bucket first, so each bucket is touched once.
+    """
+    buckets = {}
+    for transaction in transactions:
+        wallet_id, day, transaction_type, category, amount = transaction.rollup_key()
+        key = (wallet_id, day, transaction_type, category)
+        total, count = buckets.get(key, (0, 0))
+        buckets[key] = (total + amount, count + 1)
+
+    for (wallet_id, day, transaction_type, category), (total, count) in buckets.items():
+        TransactionRollup.objects.get_or_create(
+            wallet_id=wallet_id, day=day, transaction_type=transaction_type, category=category,
+        )
+        TransactionRollup.objects.filter(
+            wallet_id=wallet_id, day=day, transaction_type=transaction_type, category=category,
+        ).update(total=F('total') + total, count=F('count') + count)
@@ -0,0 +1,85 @@
+"""Full-text search over transaction descriptions.
+
+SQLite keeps an FTS5 table, api_transaction_fts, with one row per hot or
+archived transaction (rowid = transaction id). Triggers on both tables keep
+it in sync with every insert, update and delete, including bulk writes and
+archive moves. Each row carries a `w<wallet id>` token, so a user's search
+only reads that wallet's postings. PostgreSQL uses GIN expression indexes
+on to_tsvector(description), which the database maintains itself. The
+tables, triggers and indexes are created by migration 0012.
+
+Queries are split into words that must all appear, like plainto_tsquery.
+Matching rows get a `rank` annotation where higher is better.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'api_transaction_fts'
+SEARCH_CONFIG = 'simple'  # No stemming or stop words: descriptions are in several languages
+MAX_TERMS = 16
+
+# Also the expression of migration 0012's GIN indexes, so PostgreSQL can use them
+POSTGRESQL_VECTOR = "to_tsvector('{config}', coalesce({column}, ''))"
+
+
+def get_terms(query):
+    """Return the words of a search query, lowercased and de-duplicated."""
+    terms = []
+    for term in re.findall(r'\w+', query.lower()):
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_TERMS]
+
+
+def sqlite_match(terms, wallet_id=None):
+    """FTS5 query for rows containing every term, within the wallet if given."""
+    match = 'description : (' + ' '.join(f'"{term}"' for term in terms) + ')'
+    if wallet_id is not None:
+        match = f'wallet : "w{int(wallet_id)}" AND {match}'
+    return match
+
+
+def search_queryset(queryset, query, wallet_id=None):
+    """Restrict a Transaction or TransactionArchive queryset to rows matching `query`.
+
+    The rows are annotated with `rank`, higher for better matches.
+    `wallet_id` narrows the SQLite index lookup to one wallet; the queryset
+    must apply the same restriction. A query without words matches nothing.
+    """
+    terms = get_terms(query)
+    if not terms:
+        return queryset.none()
+
+    table = queryset.model._meta.db_table
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        # The MATCH in the filter is a single index lookup. bm25() only works
+        # inside a full-text query, so the rank repeats it bounded to the row's
+        # rowid, which FTS5 answers with a seek. bm25() is lower for better matches.
+        match = sqlite_match(terms, wallet_id)
+        pk = f'"{table}"."id"'
+        matches = RawSQL(
+            f'{pk} IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)', [match],
+            output_field=BooleanField(),
+        )
+        rank = RawSQL(
+            f'(SELECT -bm25({FTS_TABLE}, 0.0, 1.0) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = {pk})',
+            [match], output_field=FloatField(),
+        )
+        return queryset.filter(matches).annotate(rank=rank)
+    if vendor == 'postgresql':
+        vector = POSTGRESQL_VECTOR.format(config=SEARCH_CONFIG, column=f'"{table}"."description"')
+        tsquery = f"plainto_tsquery('{SEARCH_CONFIG}', %s)"
+        text = ' '.join(terms)
+        rank = RawSQL(f"ts_rank_cd({vector}, {tsquery})", [text], output_field=FloatField())
+        matches = RawSQL(f"{vector} @@ {tsquery}", [text], output_field=BooleanField())
+        return queryset.filter(matches).annotate(rank=rank)
+
+    # No full-text index on other backends: an unranked scan
+    condition = Q()
+    for term in terms:
+        condition &= Q(description__icontains=term)
+    return queryset.filter(condition).annotate(rank=Value(0.0, output_field=FloatField()))
@@ -1,7 +1,9 @@
 from rest_framework import serializers
-from .models import CustomUser, UserProfile, Wallet, Transaction
+from .models import CustomUser, UserProfile, Wallet, Transaction, ReportJob
+from .ledger import InsufficientBalance
+from .profiling import ProfiledSerializerMixin
 from django.contrib.auth import authenticate
-from django.contrib.auth.hashers import make_password
+from django.db.models import Q
 
 
 # Serializer for user registration
@@ -12,21 +14,31 @@ class RegisterSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ['username', 'email', 'password', 'password_confirm']
+        # Uniqueness is checked in validate() with a single query
+        extra_kwargs = {'username': {'validators': [CustomUser.username_validator]}}
 
     def validate(self, data):
         if data['password'] != data['password_confirm']:
             raise serializers.ValidationError({"password": "Passwords do not match."})
-        if CustomUser.objects.filter(username=data['username']).exists():
-            raise serializers.ValidationError({"username": "Username already exists."})
-        if CustomUser.objects.filter(email=data['email']).exists():
-            raise serializers.ValidationError({"email": "Email already exists."})
+        email = data.get('email')
+        lookup = Q(username=data['username'])
+        if email:
+            lookup |= Q(email=email)
+        taken = CustomUser.objects.filter(lookup).values_list('username', 'email')
+        errors = {}
+        for username, user_email in taken:
+            if username == data['username']:
+                errors['username'] = "Username already exists."
+            if email and user_email == email:
+                errors['email'] = "Email already exists."
+        if errors:
+            raise serializers.ValidationError(errors)
         return data
 
     def create(self, validated_data):
-        validated_data.pop('password_confirm') 
-        validated_data['password'] = make_password(validated_data['password'])  
-        user = CustomUser.objects.create(**validated_data)
-        return user
+        validated_data.pop('password_confirm')
+        # Creates the wallet and profile in the same transaction
+        return CustomUser.objects.create_user(**validated_data)
 
 
 class LoginSerializer(serializers.Serializer):
@@ -40,13 +52,13 @@ class LoginSerializer(serializers.Serializer):
         return user
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = UserProfile
         fields = ('id', 'salary')
 
 
-class WalletSerializer(serializers.ModelSerializer):
+class WalletSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Wallet
         fields = ('id', 'balance')
@@ -60,42 +72,39 @@ class UserSerializer(serializers.ModelSerializer):
         model = CustomUser
         fields = ('id', 'username', 'email', 'profile', 'wallet')
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Transaction
         fields = ('id', 'amount', 'transaction_type', 'category', 'description', 'date')  # `wallet` хориҷ карда шуд
 
-    def validate(self, data):
-        """Валидасия барои санҷидани бақияи кофӣ барои хароҷот."""
-        user = self.context['request'].user
-        wallet = Wallet.objects.get(user=user)
-        amount = data['amount']
-        transaction_type = data['transaction_type']
-
-        if transaction_type == 'expense' and wallet.balance < amount:
-            raise serializers.ValidationError({"detail": "Insufficient balance in the wallet for this expense."})
-
-        return data
-
     def create(self, validated_data):
         """Создани амалиёт ва навсозии бақияи ҳамён."""
-        transaction_type = validated_data['transaction_type']
-        amount = validated_data['amount']
+        # The balance check and update run as a single UPDATE inside Transaction.save
+        wallet = validated_data.pop('wallet', None) or Wallet.objects.get(user=self.context['request'].user)
+        transaction = Transaction(wallet=wallet, **validated_data)
+        try:
+            transaction.save(check_balance=True)
+        except InsufficientBalance as e:
+            raise serializers.ValidationError({"detail": str(e)})
+        return transaction
 
-        # `wallet`-ро аз validated_data хориҷ мекунем
-        wallet = Wallet.objects.get(user=self.context['request'].user)
-        validated_data.pop('wallet', None)  # `wallet`-ро хориҷ кунед, агар вуҷуд дошта бошад
 
-        transaction = Transaction.objects.create(wallet=wallet, **validated_data)
+class TransactionSearchSerializer(TransactionSerializer):
+    rank = serializers.FloatField(read_only=True)
 
-        # Навсозии бақияи ҳамён
-        if transaction_type == 'income':
-            wallet.update_balance(amount)
-        elif transaction_type == 'expense':
-            wallet.update_balance(-amount)
-
-        return transaction
+    class Meta(TransactionSerializer.Meta):
+        fields = TransactionSerializer.Meta.fields + ('rank',)
+        read_only_fields = fields
 
 
+class TransactionSyncSerializer(TransactionSerializer):
+    class Meta(TransactionSerializer.Meta):
+        fields = TransactionSerializer.Meta.fields + ('updated_at',)
+        read_only_fields = fields
 
 
+class ReportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReportJob
+        fields = ('id', 'params', 'status', 'error', 'created', 'started', 'finished')
+        read_only_fields = fields
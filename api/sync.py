@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Transaction, TransactionTombstone
+
+SYNC_TOKEN_SALT = 'api.sync'
+SYNC_TOKEN_MAX_AGE = getattr(settings, 'SYNC_TOKEN_MAX_AGE', timedelta(days=90))
+# Rows newer than this are left for the next sync, so a write that commits
+# after a later-stamped one cannot fall behind a client's cursor
+SYNC_SETTLE_TIME = getattr(settings, 'SYNC_SETTLE_TIME', timedelta(seconds=2))
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class InvalidSyncToken(Exception):
+    """The sync token is malformed, tampered with or for another wallet."""
+
+
+class ExpiredSyncToken(InvalidSyncToken):
+    """The sync token is older than the tombstones are kept; the client must resync from scratch."""
+
+
+def dump_token(wallet, changed_cursor, deleted_cursor):
+    return signing.dumps({
+        'w': wallet.pk,
+        'c': [changed_cursor[0].isoformat(), changed_cursor[1]],
+        'd': [deleted_cursor[0].isoformat(), deleted_cursor[1]],
+    }, salt=SYNC_TOKEN_SALT, compress=True)
+
+
+def load_token(wallet, token):
+    """Return the (changed, deleted) keyset cursors stored in a token."""
+    try:
+        data = signing.loads(token, salt=SYNC_TOKEN_SALT, max_age=SYNC_TOKEN_MAX_AGE)
+    except signing.SignatureExpired:
+        raise ExpiredSyncToken("Sync token has expired, start a full sync.")
+    except signing.BadSignature:
+        raise InvalidSyncToken("Invalid sync token.")
+    try:
+        if data['w'] != wallet.pk:
+            raise InvalidSyncToken("Invalid sync token.")
+        return tuple(
+            (datetime.fromisoformat(data[stream][0]), int(data[stream][1]))
+            for stream in ('c', 'd')
+        )
+    except (KeyError, TypeError, ValueError):
+        raise InvalidSyncToken("Invalid sync token.")
+
+
+def read_after(queryset, field, cursor, horizon, limit):
+    """Rows with (field, id) after the cursor and field <= horizon, in keyset order.
+
+    Returns (rows, new cursor, has_more).
+    """
+    after, after_id = cursor
+    rows = list(
+        queryset.filter(Q(**{f'{field}__gt': after}) | Q(**{field: after, 'id__gt': after_id}))
+        .filter(**{f'{field}__lte': horizon})
+        .order_by(field, 'id')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        cursor = (getattr(rows[-1], field), rows[-1].pk)
+    return rows, cursor, has_more
+
+
+def get_changes(wallet, token=None, limit=500):
+    """Return the wallet's transactions changed and deleted since `token`.
+
+    Without a token every current transaction counts as changed. Both
+    streams are read with keyset cursors over the (wallet, timestamp, id)
+    indexes, so the cost follows the number of changes, not the history.
+    Returns (changed transactions, deleted ids, next token, has_more).
+    """
+    horizon = timezone.now() - SYNC_SETTLE_TIME
+    if token:
+        changed_cursor, deleted_cursor = load_token(wallet, token)
+    else:
+        # Deletions before a full sync are already reflected in its rows
+        changed_cursor, deleted_cursor = (EPOCH, 0), (horizon, 0)
+
+    changed, changed_cursor, more_changed = read_after(
+        Transaction.objects.filter(wallet=wallet), 'updated_at', changed_cursor, horizon, limit,
+    )
+    tombstones, deleted_cursor, more_deleted = read_after(
+        TransactionTombstone.objects.filter(wallet=wallet), 'deleted_at', deleted_cursor, horizon, limit,
+    )
+    deleted = [tombstone.transaction_id for tombstone in tombstones]
+    token = dump_token(wallet, changed_cursor, deleted_cursor)
+    return changed, deleted, token, more_changed or more_deleted
+
+
+def purge_tombstones():
+    """Delete tombstones no valid sync token can still need; returns how many."""
+    cutoff = timezone.now() - SYNC_TOKEN_MAX_AGE
+    return TransactionTombstone.objects.filter(deleted_at__lt=cutoff).delete()[0]
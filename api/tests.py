@@ -1,3 +1,920 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.forms import modelform_factory
+from django.http import StreamingHttpResponse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import payroll
+from .archive import archive_transactions
+from .fast_serializers import get_row_encoder
+from .profiling import count_query, percentiles, route_stats
+from .views import ReportView
+from .report_jobs import claim_jobs, heartbeat, requeue_stale, run_job
+from .models import (
+    CustomUser, PayrollPayment, PayrollRun, Transaction, TransactionArchive, TransactionRollup, TransactionTombstone,
+    UserProfile, Wallet,
+)
+from .rollups import rebuild_rollups
+from .serialaizer import TransactionSerializer
+from .users import create_users, provision_accounts
+
+
+def aware(year, month=1, day=1, hour=12):
+    return timezone.make_aware(datetime(year, month, day, hour))
+
+
+class APITestCase(TestCase):
+    """Creates a user with a wallet and an authenticated API client."""
+
+    def setUp(self):
+        # Local-memory caches outlive each test's rolled back transaction
+        for cache in caches.all():
+            cache.clear()
+        self.user = CustomUser.objects.create_user('alice', 'alice@example.com', 'secret-pass')
+        self.wallet = Wallet.objects.get(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_transaction(self, amount, transaction_type='income', date=None, category='other', description=None):
+        transaction = Transaction(
+            wallet=self.wallet, amount=Decimal(amount), transaction_type=transaction_type,
+            category=category, description=description,
+        )
+        transaction.save()
+        if date is not None:
+            # `date` is auto_now_add; a second save moves the row to the wanted day
+            transaction.date = date
+            transaction.save()
+        return transaction
+
+    def rollups(self):
+        return set(TransactionRollup.objects.values_list('wallet_id', 'day', 'transaction_type', 'category', 'total', 'count'))
+
+    def assertRollupsMatchTransactions(self):
+        kept = self.rollups()
+        rebuild_rollups()
+        self.assertEqual(kept, self.rollups())
+
+
+class RollupTests(APITestCase):
+    def test_create_credits_the_wallet_and_its_rollup(self):
+        response = self.client.post('/api/transactions/', {'amount': '25.00', 'transaction_type': 'income', 'category': 'food'})
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post('/api/transactions/', {'amount': '5.00', 'transaction_type': 'expense', 'category': 'food'})
+        self.assertEqual(response.status_code, 201)
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('20.00'))
+        self.assertEqual(TransactionRollup.objects.count(), 2)
+        self.assertRollupsMatchTransactions()
+
+    def test_update_moves_the_transaction_between_rollups(self):
+        transaction = self.add_transaction('10.00', category='food', date=aware(2024, 3, 1))
+        response = self.client.patch(f'/api/transactions/{transaction.pk}/', {'category': 'transport', 'amount': '12.50'})
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(
+            list(TransactionRollup.objects.values_list('category', 'total', 'count')),
+            [('transport', Decimal('12.50'), 1)],
+        )
+        self.assertRollupsMatchTransactions()
+
+    def test_update_of_a_deferred_load_subtracts_the_stored_values(self):
+        transaction = self.add_transaction('10.00', category='food', date=aware(2024, 3, 1))
+        deferred = Transaction.objects.only('id', 'category').get(pk=transaction.pk)
+        deferred.category = 'other'
+        deferred.save()
+
+        self.assertEqual(list(TransactionRollup.objects.values_list('category', 'count')), [('other', 1)])
+        self.assertRollupsMatchTransactions()
+
+    def test_delete_removes_the_transaction_from_its_rollup(self):
+        kept = self.add_transaction('10.00', date=aware(2024, 3, 1))
+        deleted = self.add_transaction('4.00', date=aware(2024, 3, 1))
+        response = self.client.delete(f'/api/transactions/{deleted.pk}/')
+        self.assertEqual(response.status_code, 204)
+
+        self.assertEqual(list(TransactionRollup.objects.values_list('total', 'count')), [(Decimal('10.00'), 1)])
+        self.assertRollupsMatchTransactions()
+
+        kept.delete()
+        self.assertFalse(TransactionRollup.objects.exists())
+
+
+class ImportTests(APITestCase):
+    rows = [
+        {'amount': '100.00', 'transaction_type': 'income', 'category': 'other'},
+        {'amount': '30.00', 'transaction_type': 'expense', 'category': 'food'},
+        {'amount': '20.00', 'transaction_type': 'expense', 'category': 'food', 'description': 'lunch'},
+    ]
+
+    def test_balance_moves_once_by_the_net_amount(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/transactions/bulk/?batch_size=2', self.rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 3)
+
+        wallet_updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "api_wallet"')]
+        self.assertEqual(len(wallet_updates), 1)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('50.00'))
+        self.assertEqual(Transaction.objects.count(), 3)
+        self.assertRollupsMatchTransactions()
+
+    def test_overdrawing_batch_is_rejected_as_a_whole(self):
+        rows = [
+            {'amount': '10.00', 'transaction_type': 'income', 'category': 'other'},
+            {'amount': '15.00', 'transaction_type': 'expense', 'category': 'food'},
+        ]
+        response = self.client.post('/api/transactions/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('0.00'))
+        self.assertFalse(Transaction.objects.exists())
+        self.assertFalse(TransactionRollup.objects.exists())
+
+    def test_csv_body(self):
+        body = (
+            'amount,transaction_type,category,description\r\n'
+            '100.00,income,other,\r\n'
+            '30.00,expense,food,lunch\r\n'
+        )
+        response = self.client.post('/api/transactions/bulk/', body, content_type='text/csv')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            list(Transaction.objects.order_by('id').values_list('amount', 'category', 'description')),
+            [(Decimal('100.00'), 'other', ''), (Decimal('30.00'), 'food', 'lunch')],
+        )
+        self.assertRollupsMatchTransactions()
+
+    def test_ndjson_body(self):
+        body = '\n'.join(json.dumps(row) for row in self.rows) + '\n\n'
+        response = self.client.post('/api/transactions/bulk/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 3)
+        self.assertRollupsMatchTransactions()
+
+    def test_invalid_rows_are_reported_by_index(self):
+        rows = self.rows + [{'amount': 'ten', 'transaction_type': 'income', 'category': 'other'}]
+        response = self.client.post('/api/transactions/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data['errors']), [3])
+        self.assertIn('amount', response.data['errors'][3])
+        self.assertFalse(Transaction.objects.exists())
+
+        response = self.client.post('/api/transactions/bulk/', '{"amount": oops}\n', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+
+
+class FastListTests(APITestCase):
+    def instances(self):
+        return [
+            Transaction(
+                id=1, amount=Decimal('10.005'), transaction_type='income', category='food', description=None,
+                date=datetime(2024, 2, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            ),
+            Transaction(
+                id=2, amount=Decimal('10.015'), transaction_type='expense', category='other', description='café «ночь»',
+                date=datetime(2024, 7, 1, 23, 59, 59, tzinfo=ZoneInfo('America/New_York')),
+            ),
+            Transaction(
+                id=3, amount=Decimal('-0.1'), transaction_type='expense', category='transport', description='',
+                date=datetime(2024, 12, 31, 23, 0, tzinfo=ZoneInfo('Asia/Dushanbe')),
+            ),
+        ]
+
+    def assertSameBytes(self, instances):
+        encoder = get_row_encoder(TransactionSerializer)
+        rows = [{source: getattr(instance, source) for source in encoder.sources} for instance in instances]
+        renderer = JSONRenderer()
+        self.assertEqual(
+            renderer.render(encoder.encode_many(rows)),
+            renderer.render(TransactionSerializer(instances, many=True).data),
+        )
+
+    def test_rows_render_like_the_serializer(self):
+        self.assertSameBytes(self.instances())
+        with timezone.override('Asia/Dushanbe'):
+            self.assertSameBytes(self.instances())
+
+        data = TransactionSerializer(self.instances(), many=True).data
+        self.assertEqual([row['amount'] for row in data], ['10.00', '10.02', '-0.10'])
+        self.assertIsNone(data[0]['description'])
+        self.assertEqual(
+            [row['date'] for row in data],
+            ['2024-02-01T12:30:15.123456Z', '2024-07-02T03:59:59Z', '2024-12-31T18:00:00Z'],
+        )
+
+    def test_list_renders_like_the_serializer(self):
+        self.add_transaction('10.00', date=aware(2024, 2, 1))
+        self.add_transaction('2.50', 'expense', date=aware(2024, 3, 1), category='food', description='lunch')
+        queryset = Transaction.objects.order_by('-date', '-id')
+        for timezone_name in ('UTC', 'America/New_York'):
+            with timezone.override(timezone_name):
+                results = self.client.get('/api/transactions/').data['results']
+                expected = TransactionSerializer(queryset, many=True).data
+            self.assertEqual(JSONRenderer().render(results), JSONRenderer().render(expected), timezone_name)
+
+
+class CursorPaginationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        # Groups of rows share a date, so the cursor has to break ties on id
+        for i in range(23):
+            self.add_transaction('1.00', date=aware(2020 + i % 5, 1 + i % 3, 1))
+        self.expected = list(
+            Transaction.objects.order_by('-date', '-id').values_list('id', flat=True)
+        )
+
+    def walk(self, url):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            data = response.data.get('transaction_details', response.data)
+            ids += [row['id'] for row in data['results']]
+            url, pages = data['next'], pages + 1
+        return ids, pages
+
+    def test_walks_every_row_once(self):
+        ids, pages = self.walk('/api/transactions/?pagination=cursor&page_size=4')
+        self.assertEqual(ids, self.expected)
+        self.assertEqual(pages, 6)
+
+    def test_walks_archived_rows(self):
+        archive_transactions(cutoff=aware(2022, 1, 1))
+        self.assertTrue(TransactionArchive.objects.exists())
+        ids, _ = self.walk('/api/transactions/?pagination=cursor&page_size=4')
+        self.assertEqual(ids, self.expected)
+
+    def test_walks_report_pages(self):
+        ids, _ = self.walk('/api/reports/?pagination=cursor&page_size=5')
+        self.assertEqual(ids, self.expected)
+
+    def test_count_only_when_asked(self):
+        data = self.client.get('/api/transactions/?pagination=cursor&count=true').data
+        self.assertEqual(data['count'], 23)
+        self.assertNotIn('count', self.client.get('/api/transactions/?pagination=cursor').data)
+
+    def assertNoCountQuery(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query['sql'] for query in queries if '__count' in query['sql']])
+        return response.data
+
+    @mock.patch.object(ReportView, 'use_rollups', False)
+    def test_report_pages_reuse_the_summary_count(self):
+        data = self.assertNoCountQuery('/api/reports/?pagination=cursor&count=true')
+        self.assertEqual(data['transaction_details']['count'], 23)
+        data = self.assertNoCountQuery('/api/reports/?page=2')
+        self.assertEqual(data['transaction_details']['count'], 23)
+
+
+class ReportTests(APITestCase):
+    def test_async_report_matches_the_sync_report(self):
+        self.add_transaction('30.00', date=aware(2024, 2, 1))
+        self.add_transaction('12.00', 'expense', date=aware(2024, 2, 3), category='food')
+        self.client.force_login(self.user)
+
+        expected = self.client.get('/api/reports/?year=2024').json()
+        response = self.client.get('/api/async/reports/?year=2024')
+        self.assertEqual(response.status_code, 200)
+        actual = response.json()
+        for key in ('income', 'expense', 'total_transactions', 'transaction_categories', 'last_transaction'):
+            self.assertEqual(actual[key], expected[key], key)
+        self.assertEqual(actual['transaction_details']['results'], expected['transaction_details']['results'])
+
+    def test_async_views_only_answer_get(self):
+        self.client.force_login(self.user)
+        for url in ('/api/async/reports/', '/api/async/transactions/', f'/api/async/wallets/{self.wallet.pk}/'):
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+            for method in (self.client.post, self.client.put, self.client.delete):
+                response = method(url)
+                self.assertEqual(response.status_code, 405, url)
+                self.assertEqual(response['Allow'], 'GET', url)
+
+    def test_pages_come_from_the_rows_when_rollups_drift(self):
+        for month in (1, 2, 3):
+            self.add_transaction('10.00', date=aware(2024, month, 5))
+        TransactionRollup.objects.all().delete()
+
+        response = self.client.get('/api/reports/?year=2024')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['transaction_details']['count'], 3)
+        self.assertEqual(len(response.data['transaction_details']['results']), 3)
+
+
+class PayrollTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        UserProfile.objects.filter(user=self.user).update(salary=Decimal('1000.00'))
+        self.admin = CustomUser.objects.create_user('admin', 'admin@example.com', 'secret-pass', is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def test_salary_change_is_only_recorded(self):
+        profile = UserProfile.objects.get(user=self.user)
+        profile.salary = Decimal('1500.00')
+        profile.save()
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, 0)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_run_pays_each_wallet_once(self):
+        for expected in (201, 200):
+            response = self.client.post('/api/payroll/', {'period': '2024-05'}, format='json')
+            self.assertEqual(response.status_code, expected)
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('1000.00'))
+        self.assertEqual(Transaction.objects.filter(wallet=self.wallet).count(), 1)
+
+    def test_concurrent_payment_returns_conflict(self):
+        pay_chunk = payroll.pay_chunk
+
+        def paid_concurrently(run, rows):
+            PayrollPayment.objects.create(run=run, wallet=self.wallet, amount=Decimal('1000.00'))
+            pay_chunk(run, rows)
+
+        with mock.patch('api.payroll.pay_chunk', side_effect=paid_concurrently):
+            response = self.client.post('/api/payroll/', {'period': '2024-05'}, format='json')
+        self.assertEqual(response.status_code, 409)
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, 0)
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(PayrollRun.objects.get().payments.count(), 1)
+
+
+class UserCacheTests(APITestCase):
+    def test_write_without_invalidation_is_not_served_stale(self):
+        url = f'/api/wallets/{self.wallet.pk}/'
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        # Like a write in another process: the version changes, this process's cache is not told
+        with mock.patch('api.models.user_cache.invalidate'):
+            self.add_transaction('10.00')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['balance'], '10.00')
+
+
+class ProvisioningTests(TestCase):
+    rows = [
+        {'username': f'user{i}', 'email': f'user{i}@example.com', 'salary': Decimal(100 * i)}
+        for i in range(1, 6)
+    ]
+
+    def assertProvisioned(self, *usernames):
+        for username in usernames:
+            self.assertEqual(Wallet.objects.filter(user__username=username).count(), 1, username)
+            self.assertEqual(UserProfile.objects.filter(user__username=username).count(), 1, username)
+
+    def test_create_user_and_register_provision_once(self):
+        CustomUser.objects.create_user('alice', 'alice@example.com', 'secret-pass')
+        response = APIClient().post('/accounts/register/', {
+            'username': 'bob', 'email': 'bob@example.com', 'password': 'secret-pass', 'password_confirm': 'secret-pass',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertProvisioned('alice', 'bob')
+        self.assertEqual(Wallet.objects.count(), 2)
+        self.assertEqual(UserProfile.objects.count(), 2)
+
+    def test_last_login_save_writes_only_the_user(self):
+        user = CustomUser.objects.create_user('alice', 'alice@example.com', 'secret-pass')
+        user.last_login = timezone.now()
+        with CaptureQueriesContext(connection) as queries:
+            user.save(update_fields=['last_login'])
+        self.assertEqual([q['sql'].split()[:2] for q in queries], [['UPDATE', '"api_customuser"']])
+
+    def test_create_users_in_batches(self):
+        with CaptureQueriesContext(connection) as queries:
+            users = create_users(self.rows, batch_size=2)
+        self.assertEqual([user.username for user in users], [row['username'] for row in self.rows])
+        user_inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "api_customuser"')]
+        self.assertEqual(len(user_inserts), 3)
+        self.assertProvisioned(*(row['username'] for row in self.rows))
+        self.assertEqual(
+            dict(UserProfile.objects.values_list('user__username', 'salary')),
+            {row['username']: row['salary'] for row in self.rows},
+        )
+        self.assertFalse(users[0].has_usable_password())
+
+    def test_backends_without_returning_bulk_inserts(self):
+        features = type(connection.features)
+        with mock.patch.object(features, 'can_return_rows_from_bulk_insert', False):
+            users = create_users(self.rows, batch_size=2)
+            wallets = provision_accounts([CustomUser.objects.create(username='carol')])
+        self.assertTrue(all(user.pk for user in users))
+        self.assertEqual([wallet.user.username for wallet in wallets], ['carol'])
+        self.assertTrue(wallets[0].pk)
+        self.assertEqual(
+            dict(UserProfile.objects.values_list('user__username', 'salary')),
+            {**{row['username']: row['salary'] for row in self.rows}, 'carol': 0},
+        )
+
+
+class ConditionalGetTests(APITestCase):
+    def get_report(self, **headers):
+        return self.client.get('/api/reports/', **headers)
+
+    def test_create_bumps_the_version_once(self):
+        version = self.wallet.version
+        self.add_transaction('10.00')
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.version, version + 1)
+
+    def test_etag_answers_not_modified_until_a_change(self):
+        etag = self.get_report()['ETag']
+        self.assertEqual(self.get_report(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.add_transaction('10.00')
+        response = self.get_report(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since_alone_is_not_trusted(self):
+        last_modified = self.get_report()['Last-Modified']
+        self.add_transaction('10.00')  # within the same second
+        self.assertEqual(self.get_report(HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+    def test_account_details_change_the_report(self):
+        etag = self.get_report()['ETag']
+        self.user.first_name = 'Alice'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        response = self.get_report(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user_info']['full_name'], 'Alice')
+
+    def test_last_login_does_not_change_the_report(self):
+        etag = self.get_report()['ETag']
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(self.get_report(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_admin_cannot_edit_the_version(self):
+        admin_user = CustomUser.objects.create_superuser('root', 'root@example.com', 'secret-pass')
+        self.client.force_login(admin_user)
+        version = Wallet.objects.get(pk=self.wallet.pk).version
+        url = f'/admin/api/wallet/{self.wallet.pk}/change/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        response = self.client.post(url, {'user': self.user.pk, 'version': version + 100})
+        self.assertEqual(response.status_code, 302)
+        self.wallet.refresh_from_db()
+        self.assertLess(self.wallet.version, version + 100)
+        self.assertNotIn('version', modelform_factory(Wallet, fields='__all__').base_fields)
+
+
+class IdempotencyTests(APITestCase):
+    def post(self, data, key='key-1', path='/api/transactions/', format='json'):
+        return self.client.post(path, data, format=format, HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_first_response(self):
+        data = {'amount': '10.00', 'transaction_type': 'income', 'category': 'food'}
+        first = self.post(data)
+        retry = self.post(dict(reversed(list(data.items()))))  # same data, other key order
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('10.00'))
+
+    def test_key_reused_for_other_data_is_rejected(self):
+        self.post({'amount': '10.00', 'transaction_type': 'income'})
+        response = self.post({'amount': '99.00', 'transaction_type': 'income'})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_key_reused_with_other_query_string_is_rejected(self):
+        rows = [{'amount': '10.00', 'transaction_type': 'income'}]
+        self.assertEqual(self.post(rows, path='/api/transactions/bulk/?batch_size=10').status_code, 201)
+        self.assertEqual(self.post(rows, path='/api/transactions/bulk/?batch_size=20').status_code, 422)
+
+    def test_multipart_requests_are_fingerprinted(self):
+        data = {'amount': '10.00', 'transaction_type': 'income'}
+        self.assertEqual(self.post(data, format='multipart').status_code, 201)
+        self.assertEqual(self.post(data, format='multipart')['Idempotent-Replayed'], 'true')
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_bulk_user_creation_is_idempotent(self):
+        self.user.is_staff = True
+        self.user.save()
+        rows = [{'username': 'bob', 'email': 'bob@example.com', 'first_name': 'Bob', 'last_name': 'B'}]
+        for _ in range(2):
+            response = self.post(rows, path='/api/users/bulk/')
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.assertEqual(CustomUser.objects.filter(username='bob').count(), 1)
+
+
+class ReconcileTests(TransactionTestCase):
+    def test_fix_resets_the_balance_and_drops_cached_responses(self):
+        caches['user_data'].clear()
+        user = CustomUser.objects.create_user('alice', 'alice@example.com', 'secret-pass')
+        wallet = Wallet.objects.get(user=user)
+        Transaction.objects.create(wallet=wallet, amount=Decimal('10.00'), transaction_type='income')
+        Wallet.objects.filter(pk=wallet.pk).update(balance=Decimal('99.00'))  # drift behind the ORM's back
+        client = APIClient()
+        client.force_authenticate(user)
+        self.assertEqual(client.get(f'/api/wallets/{wallet.pk}/').data['balance'], '99.00')
+        version = Wallet.objects.get(pk=wallet.pk).version
+
+        call_command('reconcile_balances', '--fix', '--workers', '1', stdout=StringIO())
+
+        wallet.refresh_from_db()
+        self.assertEqual(wallet.balance, Decimal('10.00'))
+        self.assertEqual(wallet.version, version + 1)
+        self.assertEqual(client.get(f'/api/wallets/{wallet.pk}/').data['balance'], '10.00')
+
+
+class AnalyticsTests(APITestCase):
+    def test_trends(self):
+        self.add_transaction('100.00', date=aware(2024, 1, 2))
+        self.add_transaction('10.00', 'expense', date=aware(2024, 1, 3), category='food')
+        self.add_transaction('20.00', 'expense', date=aware(2024, 2, 3), category='food')
+        self.add_transaction('5.00', 'expense', date=aware(2024, 2, 4), category='transport')
+        self.add_transaction('30.00', 'expense', date=aware(2024, 3, 3), category='food')
+
+        response = self.client.get('/api/reports/trends/')
+        self.assertEqual(response.status_code, 200)
+        trends = response.data
+        self.assertEqual(trends['months'], ['2024-01', '2024-02', '2024-03'])
+        self.assertEqual(trends['income'], [100.0, 0.0, 0.0])
+        self.assertEqual(trends['expense'], [10.0, 25.0, 30.0])
+        self.assertEqual(trends['net'], [90.0, -25.0, -30.0])
+        self.assertEqual(trends['expense_change'], [None, 15.0, 5.0])
+        self.assertEqual(trends['expense_change_pct'], [None, 150.0, 20.0])
+        self.assertEqual(trends['categories']['food']['moving_average'], [None, None, 20.0])
+        self.assertEqual(trends['categories']['transport']['moving_average'], [None, None, 1.67])
+        # Least-squares line through 10, 25, 30 gives 41.67 next; income falls below 0 and is clamped
+        self.assertEqual(trends['forecast'], {'month': '2024-04', 'income': 0.0, 'expense': 41.67})
+
+    def test_window_is_validated(self):
+        self.assertEqual(self.client.get('/api/reports/trends/?window=13').status_code, 400)
+
+
+@mock.patch('api.profiling.PROFILING_HEADERS', True)
+class ProfilingTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        route_stats.reset()
+        self.add_transaction('10.00')
+        self.add_transaction('5.00', 'expense')
+
+    def assertQueriesCounted(self, get, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(len(queries), 0)
+        self.assertEqual(int(response['X-Profile-Queries']), len(queries))
+        # The counter is only installed for the duration of a request
+        self.assertNotIn(count_query, connection.execute_wrappers)
+
+    def test_counts_the_queries_of_sync_views(self):
+        self.assertQueriesCounted(self.client.get, '/api/transactions/')
+
+    def test_counts_the_queries_of_async_views(self):
+        self.client.force_login(self.user)
+        self.assertQueriesCounted(self.client.get, '/api/async/transactions/')
+
+        # Through the ASGI handler the middleware runs its async path
+        self.async_client.cookies = self.client.cookies
+        self.assertQueriesCounted(async_to_sync(self.async_client.get), '/api/async/transactions/')
+
+    def test_stats_report_percentiles_per_route(self):
+        for _ in range(3):
+            self.client.get('/api/transactions/')
+        self.assertEqual(self.client.get('/api/stats/').status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        stats = self.client.get('/api/stats/').json()
+        route = stats['GET /api/transactions/']
+        self.assertEqual(route['requests'], 3)
+        self.assertEqual(set(route['queries']), {'p50', 'p95', 'p99', 'max'})
+        self.assertGreater(route['queries']['p50'], 0)
+
+        self.assertEqual(self.client.delete('/api/stats/').status_code, 204)
+        self.assertNotIn('GET /api/transactions/', self.client.get('/api/stats/').json())
+
+    def test_percentiles(self):
+        self.assertEqual(percentiles([]), {})
+        self.assertEqual(percentiles(range(100, 0, -1)), {'p50': 51, 'p95': 96, 'p99': 100, 'max': 100})
+
+
+class ReportJobTests(APITestCase):
+    def test_job_result_is_the_report_with_every_transaction(self):
+        for day in range(1, 13):
+            self.add_transaction('10.00', 'income' if day % 3 else 'expense', date=aware(2024, 4, day))
+
+        response = self.client.post('/api/reports/jobs/', {'year': 2024, 'month': 4}, format='json')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data['id']
+        self.assertEqual(claim_jobs(5), [job_id])
+        self.assertEqual(run_job(job_id), 'done')
+
+        result = self.client.get(f'/api/reports/jobs/{job_id}/result/').json()
+        report = self.client.get('/api/reports/?year=2024&month=4&page_size=100').json()
+        self.assertEqual(result['transaction_details'], report['transaction_details']['results'])
+        for key in ('income', 'expense', 'balance', 'total_transactions', 'transaction_categories', 'user_info'):
+            self.assertEqual(result[key], report[key], key)
+
+    def test_job_with_invalid_dates_fails(self):
+        from .models import ReportJob
+
+        job = ReportJob.objects.create(user=self.user, params={'day': 31, 'month': 2, 'year': 2024})
+        claim_jobs(1)
+        self.assertEqual(run_job(job.pk), 'failed')
+        job.refresh_from_db()
+        self.assertTrue(job.error)
+
+
+class ReportJobHeartbeatTests(TransactionTestCase):
+    def test_running_job_with_a_heartbeat_is_not_requeued(self):
+        from .models import ReportJob
+
+        user = CustomUser.objects.create_user('alice', 'alice@example.com', 'secret-pass')
+        job = ReportJob.objects.create(user=user)
+        claim_jobs(1)
+        stale = timezone.now() - timedelta(hours=1)
+        ReportJob.objects.filter(pk=job.pk).update(started=stale)
+
+        with heartbeat(job.pk, interval=timedelta(milliseconds=10)):
+            time.sleep(0.2)
+        self.assertEqual(requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'running')
+        self.assertGreater(job.started, stale)
+
+        ReportJob.objects.filter(pk=job.pk).update(started=stale)  # the worker died
+        self.assertEqual(requeue_stale(), 1)
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.old = self.add_transaction('99.00', date=aware(2023, 12, 31))
+        self.first = self.add_transaction('12.5', date=aware(2024, 2, 1), category='food', description='rent, "flat"')
+        self.second = self.add_transaction('3.10', 'expense', date=aware(2024, 3, 1))
+
+    def export(self, query):
+        response = self.client.get(f'/api/transactions/export/?{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return b''.join(response.streaming_content).decode(), response
+
+    def test_csv(self):
+        body, response = self.export('year=2024')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="transactions.csv"')
+        first_date = TransactionSerializer(self.first).data['date']
+        second_date = TransactionSerializer(self.second).data['date']
+        self.assertEqual(body.splitlines(), [
+            'id,amount,transaction_type,category,description,date',
+            f'{self.first.pk},12.50,income,food,"rent, ""flat""",{first_date}',
+            f'{self.second.pk},3.10,expense,other,,{second_date}',
+        ])
+
+    def test_ndjson_includes_archived_rows(self):
+        archive_transactions(aware(2024, 1, 1))
+        body, response = self.export('output=ndjson&year=2023')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(rows, [TransactionSerializer(self.old).data])
+        self.assertIsNone(rows[0]['description'])
+
+    def test_invalid_output_and_filters(self):
+        self.assertEqual(self.client.get('/api/transactions/export/?output=xml').status_code, 400)
+        self.assertEqual(self.client.get('/api/transactions/export/?year=2024&month=13').status_code, 400)
+
+
+class SearchTests(APITestCase):
+    def search(self, query):
+        response = self.client.get('/api/transactions/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def add_matches(self, date=None):
+        # Non-matching rows keep the term rare, so bm25 scores are not clamped to ~0
+        for i in range(8):
+            self.add_transaction('1.00', description=f'groceries week {i}', date=date)
+        return [
+            self.add_transaction('1.00', description='coffee beans, coffee filters and coffee cups', date=date),
+            self.add_transaction('1.00', description='coffee', date=date),
+            self.add_transaction('1.00', description='train ticket, sandwich, newspaper and a coffee', date=date),
+        ]
+
+    def test_best_matches_come_first(self):
+        expected = [transaction.pk for transaction in self.add_matches()]
+        results = self.search('coffee')
+
+        self.assertEqual([row['id'] for row in results], expected)
+        ranks = [row['rank'] for row in results]
+        self.assertEqual(ranks, sorted(set(ranks), reverse=True))  # distinct scores, best first
+
+    def test_every_word_must_match(self):
+        self.add_matches()
+        self.assertEqual([row['description'] for row in self.search('coffee sandwich')],
+                         ['train ticket, sandwich, newspaper and a coffee'])
+        self.assertEqual(self.search('tea'), [])
+
+    def test_other_wallets_are_not_searched(self):
+        other = CustomUser.objects.create_user('bob', 'bob@example.com', 'secret-pass')
+        Transaction.objects.create(wallet=other.wallet, amount=Decimal('1.00'), transaction_type='income',
+                                   description='coffee')
+        self.assertEqual(self.search('coffee'), [])
+
+    def test_search_reaches_archived_transactions(self):
+        archived = [transaction.pk for transaction in self.add_matches(date=aware(2020, 5, 1))]
+        recent = self.add_transaction('1.00', description='coffee', date=aware(2024, 5, 1))
+        before = self.search('coffee')
+
+        archive_transactions(cutoff=aware(2021, 1, 1))
+        self.assertFalse(Transaction.objects.filter(pk__in=archived).exists())
+
+        after = self.search('coffee')
+        self.assertEqual({row['id'] for row in after}, set(archived) | {recent.pk})
+        self.assertEqual(after, before)
+
+
+class ArchiveTests(APITestCase):
+    CUTOFF = aware(2022, 1, 1)
+
+    def setUp(self):
+        super().setUp()
+        for year, month, amount, transaction_type, category in [
+            (2020, 3, '500.00', 'income', 'other'),
+            (2020, 7, '42.50', 'expense', 'food'),
+            (2021, 2, '18.00', 'expense', 'transport'),
+            (2021, 11, '60.00', 'expense', 'entertainment'),
+            (2024, 1, '300.00', 'income', 'other'),
+            (2024, 6, '25.00', 'expense', 'food'),
+        ]:
+            self.add_transaction(amount, transaction_type, aware(year, month, 10), category,
+                                 description=f'{category} payment {year}')
+        self.add_transaction('9.99', 'expense', aware(2020, 9, 1)).delete()
+
+    def get_json(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response.json()
+
+    def snapshot(self):
+        for cache in caches.all():
+            cache.clear()
+        snapshot = {
+            'balance': self.get_json(f'/api/wallets/{self.wallet.pk}/')['balance'],
+            'rollups': set(TransactionRollup.objects.values_list(
+                'day', 'transaction_type', 'category', 'total', 'count')),
+            'tombstones': TransactionTombstone.objects.count(),
+        }
+        for as_of in ('2020-12-31', '2021-06-30', '2024-12-31'):
+            snapshot[f'balance {as_of}'] = self.get_json(
+                f'/api/wallets/{self.wallet.pk}/balance/?as_of={as_of}')['balance']
+        for query in ('', 'year=2020', 'year=2021&month=11', 'year=2024'):
+            report = self.get_json(f'/api/reports/?page_size=100&{query}')
+            details = report.pop('transaction_details')
+            snapshot[f'report {query}'] = (report, details['count'], details['results'])
+            listing = self.get_json(f'/api/transactions/?page_size=100&{query}')
+            snapshot[f'list {query}'] = (listing['count'], listing['results'])
+            for output in ('csv', 'ndjson'):
+                response = self.client.get(f'/api/transactions/export/?output={output}&{query}')
+                snapshot[f'{output} {query}'] = b''.join(response.streaming_content)
+        snapshot['search'] = self.get_json('/api/transactions/search/?q=payment&page_size=100')['results']
+        return snapshot
+
+    def test_archive_has_the_transaction_columns_in_order(self):
+        # CombinedQuerySet's UNION ALL and the search triggers match the columns by position
+        columns = [field.column for field in Transaction._meta.concrete_fields]
+        self.assertEqual([field.column for field in TransactionArchive._meta.concrete_fields], columns)
+
+    def test_reads_are_unchanged_by_archiving(self):
+        before = self.snapshot()
+        version = Wallet.objects.get(pk=self.wallet.pk).version
+
+        self.assertEqual(archive_transactions(cutoff=self.CUTOFF, batch_size=2), 4)
+        self.assertEqual(Transaction.objects.count(), 2)
+        self.assertEqual(TransactionArchive.objects.count(), 4)
+        # The rows were moved, not deleted: no delete receiver ran
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).version, version)
+
+        after = self.snapshot()
+        self.assertEqual(after.keys(), before.keys())
+        for key in before:
+            self.assertEqual(after[key], before[key], key)
+
+
+@mock.patch('api.sync.SYNC_SETTLE_TIME', timedelta(0))
+class SyncTests(APITestCase):
+    def sync(self, token=None, limit=None, status_code=200):
+        params = {key: value for key, value in (('token', token), ('limit', limit)) if value is not None}
+        response = self.client.get('/api/transactions/sync/', params)
+        self.assertEqual(response.status_code, status_code)
+        return response.data
+
+    def test_full_then_incremental_sync(self):
+        kept = self.add_transaction('10.00')
+        edited = self.add_transaction('20.00')
+        deleted = self.add_transaction('30.00')
+        full = self.sync()
+        self.assertEqual({row['id'] for row in full['changed']}, {kept.pk, edited.pk, deleted.pk})
+        self.assertEqual(full['deleted'], [])
+        self.assertFalse(full['has_more'])
+
+        nothing = self.sync(full['token'])
+        self.assertEqual((nothing['changed'], nothing['deleted']), ([], []))
+
+        edited.description = 'edited'
+        edited.save()
+        deleted_id = deleted.pk
+        deleted.delete()
+        added = self.add_transaction('40.00')
+        changes = self.sync(nothing['token'])
+        self.assertEqual([row['id'] for row in changes['changed']], [edited.pk, added.pk])
+        self.assertEqual(changes['changed'][0]['description'], 'edited')
+        self.assertEqual(changes['deleted'], [deleted_id])
+
+    def test_pages_until_has_more_is_false(self):
+        ids = {self.add_transaction('1.00').pk for _ in range(5)}
+        seen, token, pages = [], None, 0
+        while True:
+            page = self.sync(token, limit=2)
+            seen += [row['id'] for row in page['changed']]
+            token, pages = page['token'], pages + 1
+            if not page['has_more']:
+                break
+        self.assertEqual(sorted(seen), sorted(ids))
+        self.assertEqual(pages, 3)
+
+    def test_recent_writes_wait_to_settle(self):
+        with mock.patch('api.sync.SYNC_SETTLE_TIME', timedelta(minutes=1)):
+            self.add_transaction('1.00')
+            self.assertEqual(self.sync()['changed'], [])
+
+    def test_bad_tokens(self):
+        self.sync('not-a-token', status_code=400)
+        other = CustomUser.objects.create_user('bob', 'bob@example.com', 'secret-pass')
+        self.client.force_authenticate(other)
+        token = self.sync()['token']
+        self.client.force_authenticate(self.user)
+        self.sync(token, status_code=400)  # another wallet's token
+
+        with mock.patch('api.sync.SYNC_TOKEN_MAX_AGE', timedelta(seconds=-1)):
+            self.sync(self.sync()['token'], status_code=410)
+
+
+class SQLitePragmaTests(SimpleTestCase):
+    def connect(self, pragmas):
+        # A connection of its own, to a file database: in-memory ones cannot switch to WAL
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_dict = {**connection.settings_dict, 'NAME': os.path.join(directory.name, 'db.sqlite3'), 'PRAGMAS': pragmas}
+        wrapper = DatabaseWrapper(settings_dict, alias='pragmas')
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+    def test_pragmas_are_applied_to_new_connections(self):
+        wrapper = self.connect({'journal_mode': 'wal', 'busy_timeout': 1234, 'cache_size': -64000})
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 1234)
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -64000)
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+    def test_unsafe_pragmas_are_refused(self):
+        for pragmas in ({'journal_mode': 'wal; DROP TABLE api_wallet'}, {'cache_size': '--1'}, {'user_version': 1}):
+            with self.assertRaises(ImproperlyConfigured):
+                self.connect(pragmas)
@@ -1,18 +1,40 @@
 from django.urls import path
 from api.views import *
+from api import async_views
 
 urlpatterns = [
     # Wallet URLs
     path('wallets/', WalletListView.as_view(), name='wallet-list'),
     path('wallets/<int:pk>/', WalletDetailView.as_view(), name='wallet-detail'),
+    path('wallets/<int:pk>/balance/', WalletBalanceView.as_view(), name='wallet-balance'),
     # Transaction URLs
     path('transactions/', TransactionListView.as_view(), name='transaction-list'),
+    path('transactions/export/', TransactionExportView.as_view(), name='transaction-export'),
+    path('transactions/search/', TransactionSearchView.as_view(), name='transaction-search'),
+    path('transactions/sync/', TransactionSyncView.as_view(), name='transaction-sync'),
+    path('transactions/bulk/', TransactionBulkCreateView.as_view(), name='transaction-bulk-create'),
     path('transactions/<int:pk>/', TransactionDetailView.as_view(), name='transaction-detail'),
 
     # UserProfile URLs
     path('userprofile/', UserProfileCreateView.as_view(), name='userprofile-create'),
     path('userprofile/list/', UserProfileListView.as_view(), name='userprofile-list'),
 
+    # Staff provisioning and payroll
+    path('users/bulk/', UserBulkCreateView.as_view(), name='user-bulk-create'),
+    path('payroll/', PayrollRunView.as_view(), name='payroll-run'),
+
     # Report URL
-    path('reports/', ReportView.as_view(), name='report')
+    path('reports/', ReportView.as_view(), name='report'),
+    path('reports/trends/', AnalyticsView.as_view(), name='report-trends'),
+    path('reports/jobs/', ReportJobListView.as_view(), name='report-job-list'),
+    path('reports/jobs/<int:pk>/', ReportJobDetailView.as_view(), name='report-job-detail'),
+    path('reports/jobs/<int:pk>/result/', ReportJobResultView.as_view(), name='report-job-result'),
+
+    # Async variants for ASGI workers
+    path('async/wallets/<int:pk>/', async_views.wallet_detail, name='async-wallet-detail'),
+    path('async/transactions/', async_views.transaction_list, name='async-transaction-list'),
+    path('async/reports/', async_views.report, name='async-report'),
+
+    path('cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
+    path('stats/', ProfilingStatsView.as_view(), name='profiling-stats'),
 ]
@@ -0,0 +1,121 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction as db_transaction
+from rest_framework import serializers
+
+from .models import CustomUser, UserProfile, Wallet
+
+USER_IMPORT_BATCH_SIZE = getattr(settings, 'USER_IMPORT_BATCH_SIZE', 1000)
+
+
+def load_pks(users):
+    """Set the pks of users inserted by `bulk_create`, read back by username.
+
+    Only needed on backends that do not return rows from bulk inserts;
+    PostgreSQL and SQLite 3.35+ set the pks already.
+    """
+    if connection.features.can_return_rows_from_bulk_insert or all(user.pk is not None for user in users):
+        return
+    pks = dict(
+        CustomUser.objects.filter(username__in=[user.username for user in users]).values_list('username', 'pk')
+    )
+    for user in users:
+        user.pk = pks[user.username]
+
+
+def provision_accounts(users, salaries=None):
+    """Create the wallet and profile of freshly created users with two bulk inserts.
+
+    `salaries` maps user pk to the starting salary. It is only recorded;
+    salaries are paid by payroll runs. Returns the wallets, read back when
+    the backend does not return rows from bulk inserts.
+    """
+    salaries = salaries or {}
+    load_pks(users)
+    wallets = Wallet.objects.bulk_create([Wallet(user=user) for user in users])
+    UserProfile.objects.bulk_create([
+        UserProfile(user=user, salary=salaries.get(user.pk, 0)) for user in users
+    ])
+    if not connection.features.can_return_rows_from_bulk_insert:
+        wallets = list(Wallet.objects.filter(user__in=users))
+    return wallets
+
+
+class UserRowSerializer(serializers.ModelSerializer):
+    """One row of a bulk provisioning file; uniqueness is checked for the whole batch."""
+    password = serializers.CharField(write_only=True, required=False, allow_blank=True)
+    salary = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'), required=False)
+
+    class Meta:
+        model = CustomUser
+        fields = ['username', 'email', 'first_name', 'last_name', 'password', 'salary']
+        extra_kwargs = {
+            'username': {'validators': [CustomUser.username_validator]},
+        }
+
+
+def validate_user_rows(rows):
+    """Validate provisioning rows in one pass.
+
+    Besides the per-row checks, usernames and emails must be unique within
+    the batch and unused in the database; each is checked with one query.
+    Returns (validated_data, errors) like `imports.validate_rows`.
+    """
+    # Empty CSV cells mean "not given"
+    rows = [
+        {key: value for key, value in row.items() if value not in ('', None)} if isinstance(row, dict) else row
+        for row in rows
+    ]
+    serializer = UserRowSerializer(data=rows, many=True)
+    if not serializer.is_valid():
+        errors = {index: row_errors for index, row_errors in enumerate(serializer.errors) if row_errors}
+        return None, errors
+
+    validated_rows = serializer.validated_data
+    errors = {}
+    for field, message in (('username', 'Username already exists.'), ('email', 'Email already exists.')):
+        values = [row.get(field) for row in validated_rows]
+        taken = set(
+            CustomUser.objects.filter(**{f'{field}__in': [value for value in values if value]})
+            .values_list(field, flat=True)
+        )
+        seen = set()
+        for index, value in enumerate(values):
+            if not value:
+                continue
+            if value in taken or value in seen:
+                errors.setdefault(index, {})[field] = [message]
+            seen.add(value)
+    if errors:
+        return None, errors
+    return validated_rows, {}
+
+
+def create_users(validated_rows, batch_size=None):
+    """Insert users with their wallets and profiles using batched `bulk_create`.
+
+    Rows without a password get an unusable one. Everything is one atomic
+    block, so a failed batch leaves no half-provisioned users. Returns the
+    created users.
+    """
+    batch_size = batch_size or USER_IMPORT_BATCH_SIZE
+    users = []
+    salaries = []
+    for row in validated_rows:
+        row = dict(row)
+        salaries.append(row.pop('salary', 0))
+        row['password'] = make_password(row.pop('password', None) or None)
+        users.append(CustomUser(**row))
+
+    created = []
+    with db_transaction.atomic():
+        for start in range(0, len(users), batch_size):
+            batch = CustomUser.objects.bulk_create(users[start:start + batch_size])
+            load_pks(batch)
+            provision_accounts(batch, {
+                user.pk: salary for user, salary in zip(batch, salaries[start:start + batch_size])
+            })
+            created.extend(batch)
+    return created
@@ -1,15 +1,43 @@
-from django.forms import ValidationError
+from datetime import datetime, time, timedelta
+
+from django.core.paginator import Paginator
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import generics, status
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.response import Response
-from api.models import Wallet, Transaction, UserProfile
-from api.serialaizer import WalletSerializer, TransactionSerializer, UserProfileSerializer
-from django.db.models import Sum, Q
-from rest_framework.pagination import PageNumberPagination
-from django.db.models import Sum
-from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from .models import Transaction
+from rest_framework.views import APIView
+
+from .analytics import get_trends
+from .archive import DEFAULT_ORDERING, get_archive_cutoff
+from .cache import user_cache
+from .checkpoints import balance_as_of
+from .conditional import ConditionalGetMixin, make_etag
+from .exports import EXPORT_FORMATS
+from .fast_serializers import FastListMixin
+from .filters import ArchiveFilterBackend, TransactionFilter, TransactionSearchFilter
+from .idempotency import IdempotentCreateMixin
+from .imports import CSVParser, NDJSONParser, validate_rows, import_transactions
+from .ledger import InsufficientBalance
+from .models import Wallet, Transaction, TransactionArchive, UserProfile, ReportJob
+from .payroll import PayrollConflict, run_payroll
+from .profiling import route_stats
+from .report_jobs import REPORT_JOB_MAX_PENDING, REPORT_PARAMS
+from .reports import build_report, validate_and_adjust_dates
+from .search import search_queryset
+from .serialaizer import (  # Fixed typo: 'serialaizer' should be 'serializers'
+    ReportJobSerializer, TransactionSearchSerializer, TransactionSerializer, TransactionSyncSerializer,
+    UserProfileSerializer, WalletSerializer,
+)
+from .sync import ExpiredSyncToken, InvalidSyncToken, get_changes
+from .users import create_users, validate_user_rows
+
 
 # Pagination
 class StandardResultsSetPagination(PageNumberPagination):
@@ -17,6 +45,78 @@ class StandardResultsSetPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
 
+
+class TransactionCursorPagination(CursorPagination):
+    """Keyset pagination over (date, id): no COUNT(*) and no OFFSET scan.
+
+    The total is only added when the client asks for it with `?count=true`.
+    """
+    ordering = ('-date', '-id')
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'count'
+    known_count = None  # Set by the view when the total is already computed
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'true':
+            self.count = self.known_count if self.known_count is not None else queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data = {'count': self.count, **response.data}
+        return response
+
+
+class UserCacheMixin:
+    """Serve GET responses from the per-user cache, keyed by the full request URL.
+
+    The key also holds the wallet's version, which every write bumps in the
+    database, so a change made by another process (another web worker, a
+    management command) makes the old entries unreachable even where that
+    process's `user_cache.invalidate` never arrives. Leave `cache_namespace`
+    as None to bypass the cache.
+    """
+    cache_namespace = None
+
+    def get_cache_version(self):
+        etag = getattr(self, 'validator_etag', None)  # Set by ConditionalGetMixin
+        if etag is None:
+            row = Wallet.objects.filter(user=self.request.user).values_list('pk', 'version', 'modified').first()
+            etag = make_etag(*row) if row else None
+        return etag
+
+    def get(self, request, *args, **kwargs):
+        if self.cache_namespace is None:
+            return super().get(request, *args, **kwargs)
+        params = (request.build_absolute_uri(), self.get_cache_version())
+        data = user_cache.get(request.user.pk, self.cache_namespace, params)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            user_cache.set(request.user.pk, self.cache_namespace, params, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+class CursorPaginationMixin:
+    """Switch a view to keyset pagination with `?pagination=cursor`."""
+    cursor_pagination_class = TransactionCursorPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.request.query_params.get('pagination') == 'cursor':
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
+
+
 class WalletListView(generics.ListCreateAPIView):
     serializer_class = WalletSerializer
     permission_classes = [IsAuthenticated]
@@ -29,28 +129,135 @@ class WalletListView(generics.ListCreateAPIView):
         serializer.save(user=self.request.user)
 
 
-class WalletDetailView(generics.RetrieveUpdateDestroyAPIView):
+class WalletDetailView(ConditionalGetMixin, UserCacheMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = WalletSerializer
+    cache_namespace = 'wallet'
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         return Wallet.objects.filter(user=self.request.user)
 
-class TransactionListView(generics.ListCreateAPIView):
+    def get_validator_queryset(self):
+        return self.get_queryset().filter(pk=self.kwargs['pk'])
+
+class TransactionListView(IdempotentCreateMixin, FastListMixin, CursorPaginationMixin, generics.ListCreateAPIView):
     serializer_class = TransactionSerializer
+    fast_serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
+    filter_backends = [ArchiveFilterBackend]
+    filterset_class = TransactionFilter
 
     def get_queryset(self):
-        return Transaction.objects.filter(wallet__user=self.request.user)
+        # Same order as the hot + archive union, so both paths page identically
+        return Transaction.objects.filter(wallet__user=self.request.user).order_by(*DEFAULT_ORDERING)
+
+    def get_archive_queryset(self):
+        return TransactionArchive.objects.filter(wallet__user=self.request.user)
 
     def perform_create(self, serializer):
         user_wallet = Wallet.objects.get(user=self.request.user)
         serializer.save(wallet=user_wallet)  
 
 
+class TransactionBulkCreateView(IdempotentCreateMixin, APIView):
+    """Import many transactions at once from a JSON array, CSV or NDJSON body."""
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, CSVParser, NDJSONParser]
+
+    def create(self, request):
+        rows = request.data
+        if not isinstance(rows, list):
+            return Response({"detail": "Expected a list of transactions."}, status=status.HTTP_400_BAD_REQUEST)
+
+        validated_rows, errors = validate_rows(rows)
+        if errors:
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            batch_size = int(request.query_params.get('batch_size', 0)) or None
+        except ValueError:
+            return Response({"detail": "batch_size must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        wallet = Wallet.objects.get(user=request.user)
+        try:
+            created = import_transactions(wallet, validated_rows, batch_size=batch_size)
+        except InsufficientBalance as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"created": len(created), "balance": wallet.balance}, status=status.HTTP_201_CREATED)
+
+
+class TransactionSyncView(APIView):
+    """Transactions changed or deleted since the `token` of the previous sync.
+
+    Start without a token for a full sync, then keep passing the returned
+    token. While `has_more` is true, request again right away.
+    """
+    permission_classes = [IsAuthenticated]
+    page_size = 500
+    max_page_size = 1000
+
+    def get(self, request):
+        try:
+            limit = min(int(request.query_params.get('limit', self.page_size)), self.max_page_size)
+        except ValueError:
+            return Response({"detail": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        if limit <= 0:
+            limit = self.page_size
+
+        wallet = get_object_or_404(Wallet, user=request.user)
+        try:
+            changed, deleted, token, has_more = get_changes(wallet, request.query_params.get('token'), limit)
+        except ExpiredSyncToken as e:
+            return Response({"detail": str(e)}, status=status.HTTP_410_GONE)
+        except InvalidSyncToken as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "changed": TransactionSyncSerializer(changed, many=True).data,
+            "deleted": deleted,
+            "token": token,
+            "has_more": has_more,
+        })
+
 
+class TransactionSearchView(FastListMixin, generics.ListAPIView):
+    """Transactions whose description contains every word of `?q=`, best matches first.
 
+    Accepts the day/month/year filters of the report plus `category`, and
+    searches archived transactions when the dates reach into the archive.
+    """
+    serializer_class = TransactionSearchSerializer
+    fast_serializer_class = TransactionSearchSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = StandardResultsSetPagination
+    filter_backends = [ArchiveFilterBackend]
+    filterset_class = TransactionSearchFilter
+    ordering = ('-rank', '-date', '-id')
+
+    def get_user_wallet(self):
+        if not hasattr(self, '_user_wallet'):
+            self._user_wallet = get_object_or_404(Wallet, user=self.request.user)
+        return self._user_wallet
+
+    def search(self, queryset):
+        wallet = self.get_user_wallet()
+        return search_queryset(queryset.filter(wallet=wallet), self.request.query_params.get('q', ''), wallet.pk)
+
+    def get_queryset(self):
+        return self.search(Transaction.objects.all())
+
+    def get_archive_queryset(self):
+        return self.search(TransactionArchive.objects.all())
+
+    def filter_queryset(self, queryset):
+        return super().filter_queryset(queryset).order_by(*self.ordering)
+
+    def list(self, request, *args, **kwargs):
+        if not request.query_params.get('q', '').strip():
+            return Response({"detail": "q is required."}, status=status.HTTP_400_BAD_REQUEST)
+        return super().list(request, *args, **kwargs)
 
 
 class TransactionDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -76,100 +283,62 @@ class UserProfileCreateView(generics.CreateAPIView):
         serializer.save(user=self.request.user)
 
 
-from django.views.decorators.cache import cache_page
-from django.utils.decorators import method_decorator
-from rest_framework import generics
-from rest_framework.permissions import IsAuthenticated
-from .models import UserProfile
 # from .s import UserProfileSerializer
-
-@method_decorator(cache_page(60 * 5), name='dispatch')  # Кеш барои 5 дақиқа
-class UserProfileListView(generics.ListAPIView):
+class UserProfileListView(ConditionalGetMixin, UserCacheMixin, generics.ListAPIView):
     serializer_class = UserProfileSerializer
+    cache_namespace = 'profile'
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         return UserProfile.objects.filter(user=self.request.user)
 
 
-from rest_framework import generics, status
-from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum, Q, Count
-from rest_framework.exceptions import ValidationError
-from .models import Transaction, Wallet
-from .serialaizer import TransactionSerializer  # Fixed typo: 'serialaizer' should be 'serializers'
-from django_filters import rest_framework as filters
-from rest_framework.pagination import PageNumberPagination
-
-
-# Filter for transactions
-class TransactionFilter(filters.FilterSet):
-    day = filters.NumberFilter(field_name='date__day')
-    month = filters.NumberFilter(field_name='date__month')
-    year = filters.NumberFilter(field_name='date__year')
-
-    class Meta:
-        model = Transaction
-        fields = ['day', 'month', 'year']
-
+# Pagination class for the API
+class CountedPaginator(Paginator):
+    """Paginator that reuses an already known total instead of running COUNT(*)."""
 
+    def __init__(self, *args, count=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if count is not None:
+            self.count = count
 
 
-# Pagination class for the API
 class CustomPagination(PageNumberPagination):
     page_size = 10  # Set the number of items per page
     page_size_query_param = 'page_size'
     max_page_size = 100  # Maximum items per page
+    known_count = None  # Set by the view when the total is already computed
+
+    def django_paginator_class(self, object_list, per_page):
+        return CountedPaginator(object_list, per_page, count=self.known_count)
 
 
-class ReportView(generics.ListAPIView):
+class ReportView(ConditionalGetMixin, UserCacheMixin, FastListMixin, CursorPaginationMixin, generics.ListAPIView):
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
+    fast_serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = CustomPagination
-    filter_backends = [filters.DjangoFilterBackend]
+    filter_backends = [ArchiveFilterBackend]
     filterset_class = TransactionFilter
+    cache_namespace = 'report'
+    use_rollups = True  # Read the summary from TransactionRollup instead of raw rows
 
     def get_queryset(self):
         """Retrieve transactions for the authenticated user's wallet."""
-        user_wallet = Wallet.objects.filter(user=self.request.user).first()
+        user_wallet = self.get_user_wallet()
         if not user_wallet:
             return Transaction.objects.none()
-        return Transaction.objects.filter(wallet=user_wallet)
-
-    def calculate_totals(self, queryset):
-        """Calculate total income and expense for the queryset."""
-        return queryset.aggregate(
-            total_income=Sum('amount', filter=Q(transaction_type='income')),
-            total_expense=Sum('amount', filter=Q(transaction_type='expense'))
-        )
+        return Transaction.objects.filter(wallet=user_wallet).order_by(*DEFAULT_ORDERING)
 
-    def count_transactions(self, queryset, transaction_type):
-        """Count the number of transactions of a specific type."""
-        return queryset.filter(transaction_type=transaction_type).count()
+    def get_archive_queryset(self):
+        return TransactionArchive.objects.filter(wallet=self.get_user_wallet())
 
     def get_user_wallet(self):
-        """Retrieve the authenticated user's wallet."""
-        return Wallet.objects.filter(user=self.request.user).first()
-
-    def count_by_category(self, queryset):
-        """Count transactions by categories."""
-        return queryset.values('category').annotate(count=Count('id'))
-
-    def get_user_info(self):
-        """Retrieve user details."""
-        user = self.request.user
-        return {
-            'username': user.username,
-            'email': user.email,
-            'full_name': user.get_full_name()
-        }
-
-    def get_last_transaction(self, queryset):
-        """Get the most recent transaction for the user."""
-        last_transaction = queryset.order_by('-date').first()
-        return TransactionSerializer(last_transaction).data if last_transaction else None
+        """Retrieve the authenticated user's wallet (fetched once per request)."""
+        if not hasattr(self, '_user_wallet'):
+            self._user_wallet = Wallet.objects.filter(user=self.request.user).first()
+        return self._user_wallet
 
     def get_pagination_info(self, page):
         """Get pagination data."""
@@ -182,34 +351,19 @@ class ReportView(generics.ListAPIView):
             'total_items': page.paginator.count
         }
 
-    def validate_and_adjust_dates(self, day, month, year):
-        """Validate and adjust the dates if day is provided but month/year is missing."""
-
-        # Вақте ки танҳо рӯз ворид мешавад ва моҳ нест
-        if day and not month:
-            raise ValidationError("Month is required when day is provided.")
-
-        # Вақте ки рӯз ва моҳ ворид мешаванд, вале сол нест
-        if day and month and not year:
-            raise ValidationError("Year is required when both day and month are provided.")
-
-        # Вақте ки моҳ ворид мешавад, солро низ талаб мекунем
-        if month and not year:
-            raise ValidationError("Year is required when month is provided.")
-
-        # Вақте ки ҳамаи 3 филтри рӯзи, моҳ ва сол ворид мешаванд
-        if day and month and year:
-            return Q(date__day=day, date__month=month, date__year=year)
-
-        # Вақте ки танҳо моҳ ва сол ворид шудаанд
-        elif month and year:
-            return Q(date__month=month, date__year=year)
-
-        # Вақте ки танҳо сол ворид шудааст
-        elif year:
-            return Q(date__year=year)
-
-        return Q()  # Агар ҳеҷ як филтри таърихро ворид накарданд
+    def paginate_report(self, queryset, summary):
+        """Return the transaction details and pagination info of the requested page."""
+        # Reuse the total when it was counted from the same rows; rollup
+        # totals are not trusted to size the pages
+        if self.paginator is not None and not self.use_rollups:
+            self.paginator.known_count = summary['total_transactions']
+        rows = self.get_list_rows(queryset)
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return self.serialize_rows(rows), {}
+        # Only the envelope comes from the paginator; the rows are serialized once
+        transaction_details = self.paginator.get_paginated_response(self.serialize_rows(page)).data
+        return transaction_details, self.get_pagination_info(page)
 
     def list(self, request, *args, **kwargs):
         """List the filtered transactions and summary statistics."""
@@ -220,55 +374,218 @@ class ReportView(generics.ListAPIView):
         month = request.GET.get('month')
         year = request.GET.get('year')
 
-        # Validate and adjust dates if necessary
+        # Validate the dates; the range itself is applied by TransactionFilter
         try:
-            date_filter = self.validate_and_adjust_dates(day, month, year)
-            queryset = queryset.filter(date_filter)
+            validate_and_adjust_dates(day, month, year)
         except ValidationError as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Retrieve total amounts and counts
-        total_transaction = self.calculate_totals(queryset)
-        income_count = self.count_transactions(queryset, 'income')
-        expense_count = self.count_transactions(queryset, 'expense')
-
         # Get user wallet and transaction details
         user_wallet = self.get_user_wallet()
         if not user_wallet:
             return Response({"detail": "Wallet not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Get summary of date range (if any)
-        date_range_summary = self.calculate_totals(queryset)
-        user_info = self.get_user_info()
-        last_transaction = self.get_last_transaction(queryset)
-        transaction_categories = self.count_by_category(queryset)
-
-        # Paginate the queryset
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            transaction_details = self.get_paginated_response(TransactionSerializer(page, many=True).data).data
-            paginator_info = self.get_pagination_info(page)  # Get pagination info
-        else:
-            transaction_details = TransactionSerializer(queryset, many=True).data
-            paginator_info = {}
-
-        # Prepare final result
-        result = {
-            'income': total_transaction['total_income'] or 0,
-            'expense': total_transaction['total_expense'] or 0,
-            'balance': user_wallet.balance,
-            'income_count': income_count,
-            'expense_count': expense_count,
-            'total_transactions': queryset.count(),
-            'date_range_summary': date_range_summary,
-            'user_info': user_info,
-            'last_transaction': last_transaction,
-            'transaction_categories': transaction_categories,
-            'transaction_details': transaction_details
-        }
+        result = build_report(
+            request.user, user_wallet, queryset, day, month, year,
+            use_rollups=self.use_rollups, paginate=self.paginate_report,
+        )
+        return Response(result, status=status.HTTP_200_OK)
 
-        # Include pagination info if the queryset is paginated
-        if paginator_info:
-            result.update(paginator_info)
 
-        return Response(result, status=status.HTTP_200_OK)
+class ReportJobListView(generics.ListCreateAPIView):
+    """Queue a full report (day/month/year as for /reports/) or list the user's jobs.
+
+    The job is computed by `manage.py report_worker`; poll its detail URL and
+    download the result once its status is `done`.
+    """
+    serializer_class = ReportJobSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = StandardResultsSetPagination
+
+    def get_queryset(self):
+        return ReportJob.objects.filter(user=self.request.user).defer('result').order_by('-created')
+
+    def create(self, request, *args, **kwargs):
+        params = {key: request.data[key] for key in REPORT_PARAMS if request.data.get(key) not in (None, '')}
+        filterset = TransactionFilter(data=params, queryset=Transaction.objects.none())
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = {key: int(value) for key, value in filterset.form.cleaned_data.items() if value is not None}
+        try:
+            validate_and_adjust_dates(params.get('day'), params.get('month'), params.get('year'))
+        except ValidationError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        pending = ReportJob.objects.filter(user=request.user, status__in=['pending', 'running']).count()
+        if pending >= REPORT_JOB_MAX_PENDING:
+            return Response(
+                {"detail": f"At most {REPORT_JOB_MAX_PENDING} report jobs can be queued at once."},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+            )
+
+        job = ReportJob.objects.create(user=request.user, params=params)
+        location = reverse('report-job-detail', kwargs={'pk': job.pk})
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': request.build_absolute_uri(location)})
+
+
+class ReportJobDetailView(generics.RetrieveAPIView):
+    serializer_class = ReportJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return ReportJob.objects.filter(user=self.request.user).defer('result')
+
+
+class ReportJobResultView(APIView):
+    """Download the payload of a finished report job."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        job = get_object_or_404(ReportJob, pk=pk, user=request.user)
+        if job.status != 'done':
+            return Response({"detail": f"Report job is {job.status}."}, status=status.HTTP_409_CONFLICT)
+        response = Response(job.result)
+        response['Content-Disposition'] = f'attachment; filename="report-{job.pk}.json"'
+        return response
+
+
+class AnalyticsView(ConditionalGetMixin, generics.RetrieveAPIView):
+    """Monthly trends, per-category moving averages and a spend forecast.
+
+    `?window=` sets the moving-average length in months (1-12, default 3).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get_object(self):
+        return get_object_or_404(Wallet, user=self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            window = int(request.query_params.get('window', 3))
+        except ValueError:
+            window = 0
+        if not 1 <= window <= 12:
+            return Response({"detail": "window must be an integer from 1 to 12."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(get_trends(self.get_object(), window))
+
+
+class TransactionExportView(APIView):
+    """Stream the user's transactions as CSV or NDJSON (`?output=ndjson`).
+
+    Accepts the same day/month/year filters as the report.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response({"detail": f"Unknown output '{output}'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        filterset = TransactionFilter(
+            request.query_params,
+            queryset=Transaction.objects.filter(wallet__user=request.user),
+        )
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+        queryset = filterset.with_archive(
+            TransactionArchive.objects.filter(wallet__user=request.user), get_archive_cutoff(),
+        )
+
+        iter_output, content_type = EXPORT_FORMATS[output]
+        response = StreamingHttpResponse(iter_output(queryset), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="transactions.{output}"'
+        return response
+
+
+class CacheStatsView(APIView):
+    """Hit/miss counters of the per-user cache in this process (staff only)."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(user_cache.stats())
+
+
+class ProfilingStatsView(APIView):
+    """Per-route p50/p95/p99 of latency, queries and serializer time (staff only).
+
+    DELETE clears the collected samples.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(route_stats.summary())
+
+    def delete(self, request):
+        route_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UserBulkCreateView(IdempotentCreateMixin, APIView):
+    """Provision many users with their wallets and profiles (staff only).
+
+    Accepts a JSON array, CSV or NDJSON body of rows with username, email,
+    first_name, last_name and optional password and salary.
+    """
+    permission_classes = [IsAdminUser]
+    parser_classes = [JSONParser, CSVParser, NDJSONParser]
+
+    def create(self, request):
+        rows = request.data
+        if not isinstance(rows, list):
+            return Response({"detail": "Expected a list of users."}, status=status.HTTP_400_BAD_REQUEST)
+
+        validated_rows, errors = validate_user_rows(rows)
+        if errors:
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        created = create_users(validated_rows)
+        return Response({"created": len(created)}, status=status.HTTP_201_CREATED)
+
+
+class PayrollRunView(APIView):
+    """Credit salaries for a pay period (staff only).
+
+    POST {"period": "YYYY-MM", "users": [ids]}; without `users` every profile
+    with a salary is paid. Re-posting a period only pays the wallets that
+    were not paid yet; 409 if a concurrent run is paying the same wallets.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        period = request.data.get('period')
+        user_ids = request.data.get('users')
+        if user_ids is not None and not (
+            isinstance(user_ids, list) and all(isinstance(pk, int) for pk in user_ids)
+        ):
+            return Response({"detail": "users must be a list of user ids."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            result = run_payroll(period, user_ids=user_ids)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except PayrollConflict as e:
+            return Response({"detail": str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(result, status=status.HTTP_201_CREATED if result['paid'] else status.HTTP_200_OK)
+
+
+class WalletBalanceView(APIView):
+    """Balance of the wallet before `?as_of=` (ISO datetime, or a date for the end of that day)."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        wallet = get_object_or_404(Wallet, pk=pk, user=request.user)
+        value = request.query_params.get('as_of')
+        if not value:
+            return Response({'as_of': None, 'balance': wallet.balance})
+
+        as_of = parse_datetime(value)
+        if as_of is None:
+            day = parse_date(value)
+            if day is None:
+                return Response({"detail": "as_of must be an ISO date or datetime."}, status=status.HTTP_400_BAD_REQUEST)
+            as_of = datetime.combine(day + timedelta(days=1), time.min)
+        if timezone.is_naive(as_of):
+            as_of = timezone.make_aware(as_of)
+
+        return Response({'as_of': as_of, 'balance': balance_as_of(wallet, as_of)})
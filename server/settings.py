@@ -10,8 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
+from datetime import timedelta
 from pathlib import Path
 
+import django
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -45,6 +50,7 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'api.profiling.QueryProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,12 +84,59 @@ WSGI_APPLICATION = 'server.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Chosen with DB_ENGINE=sqlite (default) or DB_ENGINE=postgresql
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'exaam'),
+            'USER': os.environ.get('DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            # Keep connections open between requests instead of reconnecting each time
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
     }
-}
+    # DB_POOL=pgbouncer: connect through PgBouncer in transaction pooling mode.
+    # DB_POOL=native: psycopg's connection pool inside each process (Django 5.1+).
+    DB_POOL = os.environ.get('DB_POOL', '')
+    if DB_POOL == 'pgbouncer':
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+    elif DB_POOL == 'native':
+        if django.VERSION < (5, 1):
+            raise ImproperlyConfigured('DB_POOL=native needs Django 5.1 or later, use DB_POOL=pgbouncer.')
+        DATABASES['default']['CONN_MAX_AGE'] = 0  # The pool owns connection reuse
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+        }
+    elif DB_POOL:
+        raise ImproperlyConfigured(f"Unknown DB_POOL '{DB_POOL}', use 'pgbouncer' or 'native'.")
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+            'OPTIONS': {
+                # Seconds a writer waits for the lock before "database is locked"
+                'timeout': float(os.environ.get('DB_BUSY_TIMEOUT', 20)),
+            },
+            # Applied to every new connection by api/db.py
+            'PRAGMAS': {
+                'journal_mode': os.environ.get('DB_SQLITE_JOURNAL_MODE', 'wal'),
+                'synchronous': os.environ.get('DB_SQLITE_SYNCHRONOUS', 'normal'),
+                'mmap_size': int(os.environ.get('DB_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"Unknown DB_ENGINE '{DB_ENGINE}', use 'sqlite' or 'postgresql'.")
 
 
 # Password validation
@@ -120,7 +173,16 @@ CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake',
-    }
+    },
+    # Per-user reports, balances and profiles (see api/cache.py)
+    'user_data': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'user-data',
+        'TIMEOUT': 60 * 5,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
 }
 
 # Static files (CSS, JavaScript, Images)
@@ -134,6 +196,7 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'accounts.authentication.ExpiringTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
@@ -142,3 +205,26 @@ REST_FRAMEWORK = {
     ],
 }
 AUTH_USER_MODEL = 'api.CustomUser'
+
+# Tokens issued by accounts.views.LoginView (see accounts/authentication.py)
+AUTH_TOKEN_TTL = timedelta(days=7)
+AUTH_TOKEN_CACHE_SIZE = 1024
+AUTH_TOKEN_CACHE_TTL = 60  # seconds before a cached token is rechecked
+
+# Stored responses for Idempotency-Key retries (see api/idempotency.py)
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+IDEMPOTENCY_CACHE_ALIAS = 'default'
+
+# Delta sync for offline clients (see api/sync.py)
+SYNC_TOKEN_MAX_AGE = timedelta(days=90)  # tombstones are kept this long
+SYNC_SETTLE_TIME = timedelta(seconds=2)
+
+# Background reports computed by `manage.py report_worker` (see api/report_jobs.py)
+REPORT_JOB_TIMEOUT = timedelta(minutes=5)  # running jobs without a heartbeat for this long are requeued
+REPORT_JOB_HEARTBEAT = timedelta(minutes=1)  # how often a running job bumps its `started`
+REPORT_JOB_RETENTION = timedelta(days=7)  # finished jobs are purged after this
+REPORT_JOB_MAX_PENDING = 5  # queued jobs per user
+
+# Hot/cold split of transactions (see api/archive.py and `manage.py archive_transactions`)
+TRANSACTION_ARCHIVE_AFTER = timedelta(days=730)
+TRANSACTION_ARCHIVE_BATCH_SIZE = 1000